@@ -716,6 +716,7 @@ Type=simple
 CPUAffinity=${E_CORES}
 WorkingDirectory=${app_dir}
 Environment="PATH=${app_dir}/venv/bin:/usr/local/bin:/usr/bin:/bin"
+Environment="CINESTREAM_PROD=1"
 ExecStart=${app_dir}/venv/bin/python ${app_dir}/src/main.py --port %i
 Restart=always
 RestartSec=10
@@ -7,9 +7,11 @@ import os
 import json
 import re
 import time
+import traceback
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta, timezone, time as dt_time, date
 import google.generativeai as genai
+from core.image_handler import download_image
 
 # Available models (cheapest first)
 MODELS = {
@@ -540,7 +542,6 @@ If movie is not showing on this date, return: {{"date": "{date_str}", "movie_tit
             }
             
         except Exception as e:
-            import traceback
             print(f"Error in scrape_city_showtimes: {e}")
             print(traceback.format_exc())
             return {
@@ -554,8 +555,6 @@ If movie is not showing on this date, return: {{"date": "{date_str}", "movie_tit
         """
         Merge movies from the new structure (theaters_by_date)
         """
-        from core.image_handler import download_image
-        
         result = []
         
         for title_key, movie_data in movie_data_by_title.items():
@@ -6,7 +6,7 @@ Downloads movie images, stores them locally, and manages cleanup
 import os
 import hashlib
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from urllib.parse import urlparse
 from PIL import Image
@@ -18,6 +18,7 @@ import io
 SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 IMAGE_BASE_DIR = os.path.join(SRC_DIR, 'static', 'movie_images')
 IMAGE_EXPIRY_DAYS = 90  # 3 months (matches MongoDB TTL)
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.webp', '.gif'})
 
 def ensure_image_directory():
     """Ensure the image directory exists"""
@@ -45,7 +46,7 @@ def get_image_filename(image_url: str, movie_title: str = None) -> str:
     
     # Clean extension (remove query params if any)
     ext = ext.split('?')[0]
-    if not ext or ext not in ['.jpg', '.jpeg', '.png', '.webp', '.gif']:
+    if not ext or ext not in IMAGE_EXTENSIONS:
         ext = '.jpg'
     
     # Create filename with movie title if available
@@ -181,7 +182,6 @@ def cleanup_old_images():
     """
     try:
         ensure_image_directory()
-        from datetime import timezone
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=IMAGE_EXPIRY_DAYS)
         
         removed_count = 0
@@ -189,7 +189,7 @@ def cleanup_old_images():
         for filepath in Path(IMAGE_BASE_DIR).glob('*'):
             if filepath.is_file():
                 # Only process image files
-                if not filepath.suffix.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.webp']:
+                if filepath.suffix.lower() not in IMAGE_EXTENSIONS:
                     continue
                 try:
                     # Check file modification time (make timezone-aware for comparison)
@@ -5,7 +5,7 @@ Prevents collisions between on-demand scraping and daily refresh
 """
 
 from pymongo.database import Database
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 LOCK_TIMEOUT = 600  # 10 minutes timeout for locks
 LOCK_SOURCE_ONDEMAND = 'on-demand'
@@ -25,7 +25,6 @@ def acquire_lock(db: Database, city_name: str, lock_source: str = LOCK_SOURCE_ON
         True if lock acquired, False if already locked
     """
     try:
-        from datetime import timezone
         now = datetime.now(timezone.utc)
         timeout_threshold = now - timedelta(seconds=LOCK_TIMEOUT)
         
@@ -122,7 +121,6 @@ def release_lock(db: Database, city_name: str, status: str = 'fresh', lock_sourc
         lock_source: Optional - only release if lock_source matches (prevents releasing someone else's lock)
     """
     try:
-        from datetime import timezone
         query = {'city_name': city_name}
         
         # If lock_source is specified, only release if we still own the lock
@@ -164,7 +162,10 @@ def is_locked(db: Database, city_name: str) -> bool:
         True if locked, False otherwise
     """
     try:
-        city = db.locations.find_one({'city_name': city_name})
+        city = db.locations.find_one(
+            {'city_name': city_name},
+            {'status': 1, 'last_updated': 1, 'lock_source': 1}
+        )
         if not city:
             return False
         
@@ -176,7 +177,6 @@ def is_locked(db: Database, city_name: str) -> bool:
         last_updated = city.get('last_updated')
         if last_updated and isinstance(last_updated, datetime):
             # Handle both timezone-aware and naive datetimes
-            from datetime import timezone
             now_utc = datetime.now(timezone.utc)
             
             if last_updated.tzinfo is None:
@@ -208,7 +208,10 @@ def get_lock_info(db: Database, city_name: str) -> dict:
         Dictionary with lock information or None if not locked
     """
     try:
-        city = db.locations.find_one({'city_name': city_name})
+        city = db.locations.find_one(
+            {'city_name': city_name},
+            {'status': 1, 'last_updated': 1, 'lock_source': 1}
+        )
         if not city or city.get('status') != 'processing':
             return None
         
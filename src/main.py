@@ -7,34 +7,335 @@ High-concurrency movie showtime aggregator with AI-powered scraping
 import os
 import sys
 import argparse
+import atexit
+import hashlib
+import mimetypes
+import re
 import smtplib
-from datetime import datetime, timezone, date
+import threading
+import time
+import traceback
+import requests
+from datetime import datetime, timezone, timedelta, date
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from ipaddress import ip_address
+from operator import attrgetter
+from types import MappingProxyType
+from typing import Any, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from flask import Flask, render_template, request, session, jsonify, redirect, url_for
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from flask import Flask, Response, g, render_template, request, session, jsonify, redirect, url_for, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.wsgi import wrap_file
+from bson import ObjectId
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pymongo import MongoClient, ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
+from urllib.parse import quote, unquote, urlparse
 from dotenv import load_dotenv
 from core.agent import ClaudeAgent
 from core.lock import acquire_lock, release_lock, get_lock_info
-from core.image_handler import cleanup_old_images, ensure_image_directory
+from core.image_handler import IMAGE_BASE_DIR, cleanup_old_images, ensure_image_directory
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - the JSON provider falls back to the stdlib json module
+    orjson = None
+
+try:
+    from ciso8601 import parse_datetime
+except ImportError:
+    # ciso8601 is optional - _parse_iso falls back to datetime.fromisoformat
+    parse_datetime = None
+
+try:
+    from deep_translator import GoogleTranslator
+except ImportError:
+    # deep-translator is optional - location names are returned untranslated
+    GoogleTranslator = None
+
+try:
+    import redis
+    from flask_session import Session
+except ImportError:
+    # flask-session/redis are optional - sessions fall back to Flask's signed cookies
+    redis = None
+    Session = None
+
+try:
+    import geoip2.database
+    import geoip2.errors
+except ImportError:
+    # geoip2 is optional - IP geolocation falls back to ip-api.com
+    geoip2 = None
 
 # Load environment variables
 load_dotenv()
 
+def _parse_args():
+    """Parse the command line for main.py"""
+    parser = argparse.ArgumentParser(description='CineStream Web Application')
+    parser.add_argument('--port', type=int, default=8000, help='Port to bind to')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to bind to')
+    parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('GUNICORN_WORKERS', '1')),
+                        help='Gunicorn worker processes (production mode only)')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('GUNICORN_THREADS', '8')),
+                        help='Threads per gunicorn worker (production mode only)')
+    parser.add_argument('--worker-connections', type=int,
+                        default=int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000')),
+                        help='Concurrent connections per gevent worker (production mode only)')
+    return parser.parse_args()
+
+def _exec_gunicorn(args):
+    """
+    Replace this process with gunicorn serving main:app (Werkzeug's server is for development only).
+    Workers import main:app themselves, so each one opens its own MongoClient after forking.
+    """
+    # gthread is the default: the Gemini client in core/agent.py talks gRPC, which gevent's monkey-patching
+    # cannot make cooperative, so a long /api/scrape would stall every greenlet on a gevent worker.
+    # GUNICORN_WORKER_CLASS=gevent is still available for deployments that do not scrape in-process.
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+    # Workers size their MongoDB pool from these (see mongo_client_options), so pass CLI overrides along
+    os.environ['GUNICORN_WORKER_CLASS'] = worker_class
+    os.environ['GUNICORN_THREADS'] = str(args.threads)
+    os.environ['GUNICORN_WORKER_CONNECTIONS'] = str(args.worker_connections)
+    print(f"Starting CineStream on {args.host}:{args.port} (gunicorn, {worker_class})")
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    os.execvp(sys.executable, [
+        sys.executable, '-m', 'gunicorn',
+        '--chdir', src_dir,
+        '--bind', f'{args.host}:{args.port}',
+        '--workers', str(args.workers),
+        '--worker-class', worker_class,
+        '--threads', str(args.threads),
+        '--worker-connections', str(args.worker_connections),
+        'main:app'
+    ])
+
+# Production: exec gunicorn before anything below connects to MongoDB, ensures indexes or starts the
+# background threads - the launcher process would otherwise do all of that (and could claim the image
+# cleanup lease) only to be replaced by exec
+if __name__ == '__main__' and os.getenv('CINESTREAM_PROD'):
+    _launch_args = _parse_args()
+    if not _launch_args.debug:
+        _exec_gunicorn(_launch_args)
+
+_UTC = timezone.utc
+
+class CineStreamJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes datetimes as ISO 8601 strings and ObjectIds as hex strings.
+    Uses orjson when it is installed, falling back to the stdlib json module.
+    """
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        if isinstance(o, ObjectId):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+    
+    def _orjson_option(self):
+        return orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+    
+    def dumps(self, obj, **kwargs):
+        # orjson has no indent/ensure_ascii options - keep stdlib for pretty-printed debug output
+        if orjson is not None and 'indent' not in kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+        return super().dumps(obj, **kwargs)
+    
+    def dumps_bytes(self, obj):
+        """Encode obj as UTF-8 JSON bytes (orjson produces bytes natively)"""
+        if orjson is not None:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option())
+        return super().dumps(obj).encode()
+    
+    def response(self, *args, **kwargs):
+        # jsonify(): hand orjson's bytes straight to the response instead of decoding to str and re-encoding
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+    
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
 app = Flask(__name__)
+# Behind one Nginx hop: take the client address and scheme from the entries Nginx appends
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
+app.json = CineStreamJSONProvider(app)
 app.secret_key = os.getenv('SECRET_KEY', 'change-me-in-production')
 
+# Shared keep-alive connection pool for outbound HTTP (Nominatim, ip-api.com)
+# Connection errors are retried - a stale pooled socket shouldn't fail the request, but a slow
+# upstream shouldn't be waited on twice. Nominatim's 429/503 throttling gets one short backoff retry
+# (Retry-After is ignored so a request thread is never parked for the server-requested delay)
+_http = requests.Session()
+_http.headers['User-Agent'] = 'CineStream/1.0'  # Required by Nominatim
+_http_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50,
+                            max_retries=Retry(total=2, connect=2, read=0, status=1,
+                                              status_forcelist=(429, 503), backoff_factor=0.2,
+                                              respect_retry_after_header=False, raise_on_status=False))
+_http.mount('https://', _http_adapter)
+_http.mount('http://', _http_adapter)
+
+def _http_get_json(url, timeout=3):
+    """GET url over the shared session and decode the JSON body; raises on HTTP errors"""
+    response = _http.get(url, timeout=timeout)
+    response.raise_for_status()
+    if orjson is not None:
+        # Parses the raw bytes directly - no text decode, and orjson.JSONDecodeError is a ValueError
+        return orjson.loads(response.content)
+    return response.json()
+
+# Nominatim address fields, in order of preference
+_CITY_KEYS = ('city', 'town', 'village', 'municipality')
+_STATE_KEYS = ('state', 'province', 'region')
+# Reverse geocoding also falls back to the wider administrative area
+_REVERSE_CITY_KEYS = _CITY_KEYS + ('county',)
+_REVERSE_STATE_KEYS = _STATE_KEYS + ('state_district',)
+
+def _pick_address_field(address, keys, default=''):
+    """Return the first non-empty Nominatim address field among keys, or default"""
+    for key in keys:
+        value = address.get(key)
+        if value:
+            return value
+    return default
+
+# Geocoding lookup results (Nominatim, GeoIP), shared by every request in the worker and -
+# when REDIS_URL is set - across workers, so one worker's miss warms the others.
+# Place names don't change, so entries live for a day; the in-process dict is bounded.
+LOOKUP_CACHE_TTL = 86400  # seconds
+LOOKUP_CACHE_MAX_ENTRIES = 50000
+CITY_SUGGESTIONS_CACHE_TTL = 3600  # seconds; suggestion prefixes and reverse lookups repeat across visitors
+CITY_SUGGESTIONS_DEADLINE = 2.5  # seconds a suggestions request waits for Nominatim before answering empty
+_lookup_cache = {}  # key -> (expires_at, value)
+
+# Small shared pool for fanning out independent outbound lookups
+_lookup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='lookup')
+_inflight_lookups = {}  # key -> Future of the upstream fetch currently running for that key
+_inflight_lock = threading.Lock()
+
+def _single_flight(key, fn, *args):
+    """Return the Future of an in-flight fetch for key, or submit fn(*args) as the one fetch for it"""
+    with _inflight_lock:
+        future = _inflight_lookups.get(key)
+        if future is None:
+            future = _lookup_executor.submit(fn, *args)
+            _inflight_lookups[key] = future
+            future.add_done_callback(lambda _: _inflight_lookups.pop(key, None))
+    return future
+
+def _lookup_cache_get(key, ttl=LOOKUP_CACHE_TTL):
+    """Return a cached lookup result, or None on a miss"""
+    entry = _lookup_cache.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    if _redis is not None:
+        try:
+            raw = _redis.get(f'cinestream:lookup:{key}')
+        except Exception as e:
+            print(f"Lookup cache read error: {e}")
+            return None
+        if raw is not None:
+            value = app.json.loads(raw)
+            _lookup_cache[key] = (time.monotonic() + ttl, value)
+            return value
+    return None
+
+def _lookup_cache_set(key, value, ttl=LOOKUP_CACHE_TTL):
+    """Cache a lookup result in-process (evicting the oldest entry when full) and in Redis if configured"""
+    if len(_lookup_cache) >= LOOKUP_CACHE_MAX_ENTRIES:
+        try:
+            del _lookup_cache[next(iter(_lookup_cache))]
+        except (KeyError, RuntimeError, StopIteration):
+            # Another thread evicted concurrently
+            pass
+    _lookup_cache[key] = (time.monotonic() + ttl, value)
+    if _redis is not None:
+        try:
+            _redis.set(f'cinestream:lookup:{key}', app.json.dumps(value), ex=ttl)
+        except Exception as e:
+            print(f"Lookup cache write error: {e}")
+
+# Local GeoIP database (GeoLite2-City / GeoIP2-City .mmdb), opened once and shared by all requests
+_geoip_reader = None
+GEOIP_DB_PATH = os.getenv('GEOIP_DB_PATH')
+if GEOIP_DB_PATH:
+    if geoip2 is None:
+        print("Warning: GEOIP_DB_PATH is set but geoip2 is not installed; using ip-api.com")
+    else:
+        try:
+            _geoip_reader = geoip2.database.Reader(GEOIP_DB_PATH)
+            # Reader.city() raises TypeError for any other database type - check once here, not per request
+            database_type = _geoip_reader.metadata().database_type
+            if 'City' not in database_type:
+                print(f"Warning: GeoIP database {GEOIP_DB_PATH} is {database_type}, not a City database; using ip-api.com")
+                _geoip_reader.close()
+                _geoip_reader = None
+        except Exception as e:
+            print(f"Warning: Could not open GeoIP database {GEOIP_DB_PATH}: {e}")
+            _geoip_reader = None
+
+# Server-side sessions: the cookie carries only an opaque session id instead of the signed session payload
+REDIS_URL = os.getenv('REDIS_URL')
+_redis = None
+if REDIS_URL:
+    if Session is None:
+        print("Warning: REDIS_URL is set but flask-session/redis are not installed; using cookie sessions")
+    else:
+        _redis = redis.Redis.from_url(REDIS_URL)
+        app.config.update(
+            SESSION_TYPE='redis',
+            SESSION_REDIS=_redis,
+            SESSION_PERMANENT=False,
+        )
+        Session(app)
+
 # MongoDB connection
 MONGO_URI = os.getenv('MONGO_URI')
 if not MONGO_URI:
     raise ValueError("MONGO_URI environment variable is required")
 
 try:
-    mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    # Pool sizing: each worker process gets its own pool, so size it to the worker's request concurrency
+    # (GUNICORN_THREADS for gthread, GUNICORN_WORKER_CONNECTIONS greenlets for gevent) plus a little headroom
+    # for background threads (visitor flush, scrapes, image cleanup)
+    # waitQueueTimeoutMS makes requests fail fast instead of queueing forever when the pool is exhausted
+    if os.getenv('GUNICORN_WORKER_CLASS') == 'gevent':
+        worker_concurrency = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+    else:
+        worker_concurrency = int(os.getenv('GUNICORN_THREADS', '8'))
+    mongo_client_options = {
+        'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', str(worker_concurrency + 8))),
+        # Kept small: idle sockets are closed after maxIdleTimeMS and reopened to refill minPoolSize
+        'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', '2')),
+        'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')),
+        # Idle sockets are recycled after a minute
+        'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '60000')),
+        'serverSelectionTimeoutMS': 5000,
+        'retryWrites': True,
+    }
+    # Optional wire compression (e.g. 'zstd,zlib'); zstd requires the zstandard package
+    if os.getenv('MONGO_COMPRESSORS'):
+        mongo_client_options['compressors'] = os.getenv('MONGO_COMPRESSORS')
+    mongo_client = MongoClient(MONGO_URI, **mongo_client_options)
     mongo_client.server_info()  # Test connection
     # Extract database name from URI or use default
-    from urllib.parse import urlparse
     parsed = urlparse(MONGO_URI)
     db_name = parsed.path.lstrip('/').split('?')[0] if parsed.path else 'movie_db'
     db = mongo_client[db_name] if db_name else mongo_client.movie_db
@@ -43,6 +344,33 @@ except (ConnectionFailure, Exception) as e:
     print("Please check MONGO_URI environment variable.")
     sys.exit(1)
 
+# Make sure the hot request paths are index-backed even if init_db.py was never run
+# create_index is a no-op when an index with the same keys and options already exists
+# Each index is ensured separately so one conflicting legacy index doesn't skip the rest
+# Deployments from before city_movie_idx was unique keep their old index until init_db.py upgrades it
+# (create_index can't change an existing index's options, and the upgrade must check for duplicates first)
+_startup_indexes = [
+    (db.movies, [('city_id', ASCENDING), ('theaters.showtimes.start_time', ASCENDING)],
+     {'name': 'city_showtime_start_idx'}),
+    (db.locations, [('city_name', ASCENDING)], {'name': 'city_name_idx', 'unique': True}),
+]
+try:
+    _city_movie_idx = db.movies.index_information().get('city_movie_idx')
+except Exception as e:
+    print(f"Warning: Could not read MongoDB indexes: {e}")
+    _city_movie_idx = None
+if _city_movie_idx is None:
+    # Unique: one document per (city, English title) - duplicate inserts are rejected by MongoDB
+    _startup_indexes.append((db.movies, [('city_id', ASCENDING), ('movie.en', ASCENDING)],
+                             {'name': 'city_movie_idx', 'unique': True}))
+elif not _city_movie_idx.get('unique'):
+    print("Warning: city_movie_idx is not unique - re-run src/scripts/init_db.py to enforce one movie per city and title")
+for collection, keys, index_options in _startup_indexes:
+    try:
+        collection.create_index(keys, **index_options)
+    except Exception as e:
+        print(f"Warning: Could not ensure MongoDB index {index_options['name']}: {e}")
+
 # Localization dictionaries
 TRANSLATIONS = {
     'en': {
@@ -107,61 +435,223 @@ TRANSLATIONS = {
     }
 }
 
+# Translation tables are read-only after import
+TRANSLATIONS = {lang: MappingProxyType(table) for lang, table in TRANSLATIONS.items()}
+
+# Languages accepted from /set-language and the session
+_VALID_LANGS = frozenset(TRANSLATIONS)
+
+# Per-language template context shared by every render; routes only add per-request values
+_BASE_CONTEXTS = {
+    lang: MappingProxyType({'translations': table, 'lang': lang})
+    for lang, table in TRANSLATIONS.items()
+}
+
+def _base_context():
+    """Template context for the session's language (English if the stored language is unknown)"""
+    return _BASE_CONTEXTS.get(get_language()) or _BASE_CONTEXTS['en']
+
 DONATION_URL = 'https://savelife.in.ua'
 
+# Scraped data verified within this window is considered fresh
+FRESHNESS_WINDOW = timedelta(hours=24)
+
+# Characters rejected in scrape location inputs (HTML/Mongo operator/path metacharacters)
+_DANGEROUS_CHARS_RE = re.compile(r'[<>{}\[\]$\\/]')
+
+# Image filenames are generated from alphanumeric movie titles (see core.image_handler),
+# so \w is used rather than [A-Za-z0-9] to keep non-Latin titles servable
+_SAFE_IMAGE_FILENAME_RE = re.compile(r'(?!.*\.\.)[\w.-]+\.(?:jpe?g|png|gif|webp)', re.IGNORECASE)
+
+# Expired movie images are removed by a background thread at this interval
+IMAGE_CLEANUP_INTERVAL = 3600  # seconds
+
+# Movie images are content-addressed (URL hash in the filename), so browsers may cache them for a week
+IMAGE_CACHE_MAX_AGE = 604800
+# Optional Nginx internal location (e.g. '/_movie_images/') that serves IMAGE_BASE_DIR directly
+IMAGE_ACCEL_REDIRECT_PREFIX = os.getenv('IMAGE_ACCEL_REDIRECT_PREFIX', '')
+_image_dir_fd = None
+
+def _get_image_dir_fd():
+    """
+    Ensure the image directory exists and return a cached fd for it (opened once per process).
+    Returns None where openat-style dir_fd access isn't supported.
+    """
+    global _image_dir_fd
+    if _image_dir_fd is None:
+        ensure_image_directory()
+        if os.open not in os.supports_dir_fd or not hasattr(os, 'O_DIRECTORY'):
+            return None
+        _image_dir_fd = os.open(IMAGE_BASE_DIR, os.O_RDONLY | os.O_DIRECTORY)
+    return _image_dir_fd
+
+# Upper bound for the /api/showtimes ?limit= parameter
+SHOWTIMES_MAX_LIMIT = 500
+
+# Encoded /api/showtimes bodies: (city, format, language, limit) -> (expires_at, body, etag)
+# Clients poll showtimes frequently; a short TTL skips re-aggregation and re-serialization
+SHOWTIMES_CACHE_TTL = 30  # seconds
+SHOWTIMES_CACHE_MAX_ENTRIES = 512
+_showtimes_cache = {}
+# Flattened showtime rows from get_showtimes_for_city, same key and TTL: key -> (expires_at, rows)
+# Serves api_scrape's "fresh" responses without re-running the aggregation
+_showtimes_rows_cache = {}
+
+# /api/scrape/status lookups: city_name -> (expires_at, projected location document or None)
+# The frontend polls every few seconds while scraping; a 1s TTL absorbs repeat polls without hiding progress
+SCRAPE_STATUS_CACHE_TTL = 1.0  # seconds
+SCRAPE_STATUS_CACHE_MAX_ENTRIES = 1024
+_scrape_status_cache = {}
+
+# Visitor counter: reads are cached briefly and increments are batched into one $inc per flush
+VISITOR_COUNT_CACHE_TTL = 10  # seconds
+VISITOR_FLUSH_THRESHOLD = 50
+VISITOR_FLUSH_INTERVAL = 30  # seconds
+_visitor_lock = threading.Lock()
+_visitor_count_cache = (0.0, 0)  # (expires_at, count)
+_pending_visitor_increments = 0
+
+# Pre-rendered index.html variants keyed by (lang, base_path)
+# Only the visitor count changes between requests, so it is spliced in via a placeholder
+_INDEX_SKELETONS = {}
+_VISITOR_COUNT_PLACEHOLDER = '__CINESTREAM_VISITOR_COUNT__'
+
 def get_language():
-    """Get user's preferred language from session or default to 'en'"""
-    return session.get('language', 'en')
+    """Get user's preferred language, cached on flask.g for the rest of the request"""
+    lang = g.get('lang')
+    if lang is None:
+        lang = g.lang = session.get('language', 'en')
+    return lang
 
 def set_language(lang):
     """Set user's preferred language"""
-    if lang in ['en', 'ua', 'ru']:
+    if lang in _VALID_LANGS:
         session['language'] = lang
+        g.lang = lang
 
-def increment_visitor_counter():
-    """Atomically increment visitor counter"""
+def _flush_visitor_increments():
+    """Write pending visitor increments to MongoDB with a single atomic $inc"""
+    global _pending_visitor_increments
+    with _visitor_lock:
+        pending = _pending_visitor_increments
+        _pending_visitor_increments = 0
+    if not pending:
+        return
     try:
         db.stats.update_one(
             {'_id': 'visitor_counter'},
-            {'$inc': {'count': 1}},
+            {'$inc': {'count': pending}},
             upsert=True
         )
     except Exception as e:
         print(f"Error incrementing visitor counter: {e}")
+        # Keep the increments for the next flush instead of losing them
+        with _visitor_lock:
+            _pending_visitor_increments += pending
+
+def _visitor_flush_loop():
+    """Flush batched visitor increments on a fixed interval, independent of traffic"""
+    while True:
+        time.sleep(VISITOR_FLUSH_INTERVAL)
+        _flush_visitor_increments()
+
+def increment_visitor_counter():
+    """Count a new visitor; increments are batched and flushed every 50 visits or by the flush thread"""
+    global _pending_visitor_increments
+    with _visitor_lock:
+        _pending_visitor_increments += 1
+        flush = _pending_visitor_increments >= VISITOR_FLUSH_THRESHOLD
+    if flush:
+        _flush_visitor_increments()
 
 def get_visitor_count():
-    """Get current visitor count"""
-    try:
-        result = db.stats.find_one({'_id': 'visitor_counter'})
-        return result.get('count', 0) if result else 0
-    except Exception as e:
-        print(f"Error getting visitor count: {e}")
-        return 0
+    """Get current visitor count (cached for a few seconds, plus this process's unflushed visits)"""
+    global _visitor_count_cache
+    now = time.monotonic()
+    with _visitor_lock:
+        expires_at, count = _visitor_count_cache
+        refresh = now >= expires_at
+        if refresh:
+            # Claim the refresh - concurrent requests keep serving the previous value meanwhile
+            _visitor_count_cache = (now + VISITOR_COUNT_CACHE_TTL, count)
+    if refresh:
+        try:
+            result = db.stats.find_one({'_id': 'visitor_counter'}, {'count': 1})
+            count = result.get('count', 0) if result else 0
+            _visitor_count_cache = (now + VISITOR_COUNT_CACHE_TTL, count)
+        except Exception as e:
+            print(f"Error getting visitor count: {e}")
+    return count + _pending_visitor_increments
+
+threading.Thread(target=_visitor_flush_loop, name='visitor-flush', daemon=True).start()
+# Don't lose batched visits when the worker shuts down
+atexit.register(_flush_visitor_increments)
+
+def _validated_geo_result(city, country, region, lat, lon, client_ip):
+    """Build a geolocation result, or return None if the city name looks like a lookup error"""
+    if not (city and country):
+        return None
+    
+    # Filter out suspicious city names:
+    # - Too short (less than 3 characters)
+    # - Contains only numbers
+    # - Very unusual patterns
+    # Common invalid patterns from IP geolocation services
+    invalid_patterns = [
+        len(city) < 3,  # Too short (reject very short names like "Auly")
+        city.isdigit(),  # Only numbers
+        # Reject very unusual single-word city names that might be errors
+        len(city.split()) == 1 and len(city) < 5 and not any(c.isupper() for c in city),  # Very short single word without capitals
+    ]
+    
+    # If city seems invalid, don't return it
+    if any(invalid_patterns):
+        print(f"Rejected suspicious city name from geolocation: '{city}' for IP {client_ip}")
+        return None
+    
+    return {
+        'city': city,
+        'country': country,
+        'region': region,
+        'lat': lat,
+        'lon': lon
+    }
 
 def detect_city_from_ip():
-    """Detect user's city and country from IP address using free GeoIP service"""
+    """Detect user's city and country from IP address (local GeoIP database, else free GeoIP service)"""
     try:
-        # Get real client IP from request headers (works with Nginx proxy)
-        # X-Forwarded-For contains the original client IP when behind a proxy
-        client_ip = request.headers.get('X-Forwarded-For', '').split(',')[0].strip()
-        if not client_ip:
-            client_ip = request.headers.get('X-Real-IP', '').strip()
-        if not client_ip:
-            client_ip = request.remote_addr
-        
-        # Skip geolocation for localhost/private IPs
-        if client_ip in ('127.0.0.1', 'localhost', '::1') or client_ip.startswith(('192.168.', '10.', '172.16.', '172.17.', '172.18.', '172.19.', '172.20.', '172.21.', '172.22.', '172.23.', '172.24.', '172.25.', '172.26.', '172.27.', '172.28.', '172.29.', '172.30.', '172.31.')):
+        # ProxyFix has already resolved the client address from Nginx's X-Forwarded-For
+        client_ip = request.remote_addr or ''
+        
+        # Skip geolocation for localhost/private IPs (and anything that isn't an IP address at all)
+        try:
+            addr = ip_address(client_ip)
+        except ValueError:
+            return None
+        if addr.is_private or addr.is_loopback or addr.is_link_local:
             return None
         
+        # Local GeoLite2-City MMDB: an in-process mmap lookup, no network hop or rate limit
+        if _geoip_reader is not None:
+            try:
+                record = _geoip_reader.city(client_ip)
+            except (geoip2.errors.AddressNotFoundError, ValueError):
+                return None
+            return _validated_geo_result(
+                record.city.name or '',
+                record.country.name or '',
+                record.subdivisions.most_specific.name or '',
+                record.location.latitude,
+                record.location.longitude,
+                client_ip
+            )
+        
         # Use free ip-api.com service (no API key required, 45 requests/minute limit)
         # Alternative: ipapi.co (requires API key for city-level data)
-        import urllib.request
-        import json
-        import time
         
-        # Rate limiting: cache results for 1 hour per IP
+        # Rate limiting: cache results per IP in the shared lookup cache (not the session cookie)
         cache_key = f"geoip_{client_ip}"
-        cached = session.get(cache_key)
+        cached = _lookup_cache_get(cache_key)
         if cached:
             return cached
         
@@ -169,46 +659,21 @@ def detect_city_from_ip():
         url = f"http://ip-api.com/json/{client_ip}?fields=status,country,regionName,city,lat,lon"
         
         try:
-            with urllib.request.urlopen(url, timeout=3) as response:
-                data = json.loads(response.read().decode())
-                
-                if data.get('status') == 'success':
-                    city = data.get('city', '').strip()
-                    country = data.get('country', '').strip()
-                    region = data.get('regionName', '').strip()
-                    
-                    # Validate city name - reject if too short, contains only numbers, or seems invalid
-                    if city and country:
-                        # Filter out suspicious city names:
-                        # - Too short (less than 3 characters)
-                        # - Contains only numbers
-                        # - Very unusual patterns
-                        city_lower = city.lower()
-                        
-                        # Common invalid patterns from IP geolocation services
-                        invalid_patterns = [
-                            len(city) < 3,  # Too short (reject very short names like "Auly")
-                            city.isdigit(),  # Only numbers
-                            # Reject very unusual single-word city names that might be errors
-                            len(city.split()) == 1 and len(city) < 5 and not any(c.isupper() for c in city),  # Very short single word without capitals
-                        ]
-                        
-                        # If city seems invalid, don't return it
-                        if any(invalid_patterns):
-                            print(f"Rejected suspicious city name from geolocation: '{city}' for IP {client_ip}")
-                            return None
-                        
-                        result = {
-                            'city': city,
-                            'country': country,
-                            'region': region,
-                            'lat': data.get('lat'),
-                            'lon': data.get('lon')
-                        }
-                        # Cache in session for 1 hour
-                        session[cache_key] = result
-                        return result
-        except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError, json.JSONDecodeError) as e:
+            data = _http_get_json(url, timeout=3)
+            
+            if data.get('status') == 'success':
+                result = _validated_geo_result(
+                    data.get('city', '').strip(),
+                    data.get('country', '').strip(),
+                    data.get('regionName', '').strip(),
+                    data.get('lat'),
+                    data.get('lon'),
+                    client_ip
+                )
+                if result:
+                    _lookup_cache_set(cache_key, result)
+                return result
+        except (requests.RequestException, ValueError) as e:
             # Silently fail - geolocation is optional
             print(f"Geolocation error for IP {client_ip}: {e}")
             pass
@@ -219,31 +684,25 @@ def detect_city_from_ip():
         print(f"Geolocation error: {e}")
     return None
 
+@lru_cache(maxsize=128)
+def _base_path_for_host(host):
+    """Root path for domain names, /cinestream/ for IP addresses and localhost"""
+    # IPv6 hosts arrive bracketed ('[::1]:8000' is cut to '[' when the port is stripped)
+    if not host or host.startswith('[') or host.lower() == 'localhost':
+        return '/cinestream/'
+    try:
+        ip_address(host)
+    except ValueError:
+        return '/'
+    return '/cinestream/'
+
 @app.context_processor
 def inject_base_path():
     """Inject base_path into all templates based on request host"""
     # Check if request is coming through domain (not IP/localhost)
-    # If Host header contains a domain name (not IP or localhost), use root path
+    # A server only ever sees a handful of Host values, so the classification is memoized
     host = request.headers.get('Host', '').split(':')[0]  # Remove port if present
-    
-    # Check if host is an IP address (IPv4 or IPv6) or localhost
-    is_ip = False
-    if host:
-        # IPv4 address check (e.g., 192.168.1.1)
-        parts = host.split('.')
-        if len(parts) == 4 and all(part.isdigit() and 0 <= int(part) <= 255 for part in parts):
-            is_ip = True
-        # IPv6 address check (contains colons and brackets)
-        elif ':' in host or host.startswith('['):
-            is_ip = True
-        # localhost variants
-        elif host.lower() in ('localhost', '127.0.0.1', '::1', '[::1]'):
-            is_ip = True
-    
-    # Use root path for domain, /cinestream/ for IP/localhost
-    base_path = '/' if (host and not is_ip) else '/cinestream/'
-    
-    return dict(base_path=base_path)
+    return dict(base_path=_base_path_for_host(host))
 
 @app.before_request
 def before_request():
@@ -263,154 +722,140 @@ def before_request():
 def index():
     """Main page"""
     try:
-        lang = get_language()
-        # Ensure lang is valid, default to 'en' if not
-        if lang not in TRANSLATIONS:
-            lang = 'en'
-        t = TRANSLATIONS[lang]
+        # Ensure lang is valid, default to 'en' if not (one dict lookup covers both)
+        base_context = _base_context()
+        lang = base_context['lang']
         
+        # Render the page once per (lang, base_path) and reuse it
         # Don't auto-detect from IP - let browser geolocation handle it
         # This gives users control and better accuracy
-        detected_city = None
-        detected_country = None
-        detected_region = None
-        
-        # Get locations
-        try:
-            locations = list(db.locations.find({'status': 'fresh'}).limit(50))
-        except Exception as e:
-            print(f"Error fetching locations: {e}")
-            locations = []
-        
-        return render_template('index.html', 
-                             translations=t,
-                             lang=lang,
-                             locations=locations,
-                             visitor_count=get_visitor_count(),
-                             donation_url=DONATION_URL,
-                             detected_city=detected_city,
-                             detected_country=detected_country,
-                             detected_region=detected_region)
+        base_path = inject_base_path()['base_path']
+        skeleton = _INDEX_SKELETONS.get((lang, base_path))
+        if skeleton is None:
+            skeleton = render_template('index.html', 
+                                       **base_context,
+                                       locations=[],
+                                       visitor_count=_VISITOR_COUNT_PLACEHOLDER,
+                                       donation_url=DONATION_URL,
+                                       detected_city=None,
+                                       detected_country=None,
+                                       detected_region=None)
+            _INDEX_SKELETONS[(lang, base_path)] = skeleton
+        
+        return skeleton.replace(_VISITOR_COUNT_PLACEHOLDER, str(get_visitor_count()), 1)
     except Exception as e:
         print(f"Error in index route: {e}")
-        import traceback
         traceback.print_exc()
         # Return basic error page with safe defaults
         return render_template('index.html', 
-                             translations=TRANSLATIONS['en'],
-                             lang='en',
+                             **_BASE_CONTEXTS['en'],
                              locations=[],
                              visitor_count=0,
                              donation_url=DONATION_URL), 500
 
+def _nominatim_location_search(city, state, country, accept_lang, timeout, free_text_fallback=True, structured=True):
+    """
+    Look up one city/state/country with Nominatim's structured search, which skips the free-text parser.
+    Falls back to a free-text query when the structured fields match nothing (unless disabled).
+    structured=False goes straight to the free-text query, for callers that already saw the structured search miss.
+    Returns the result list.
+    """
+    base_url = f"https://nominatim.openstreetmap.org/search?format=json&limit=1&addressdetails=1&accept-language={accept_lang}"
+    data = None
+    if structured:
+        fields = f"city={quote(city)}&country={quote(country)}"
+        if state:
+            fields += f"&state={quote(state)}"
+        data = _http_get_json(f"{base_url}&{fields}", timeout=timeout)
+    if not data and free_text_fallback:
+        query = ', '.join(part for part in (city, state, country) if part)
+        data = _http_get_json(f"{base_url}&q={quote(query)}", timeout=timeout)
+    return data
+
+def _nominatim_accept_lang(lang):
+    """Helper: Nominatim accept-language for one of our language codes (same as api_city_suggestions)"""
+    if lang == 'ua':
+        return 'uk'
+    if lang == 'ru':
+        return 'ru'
+    return 'en'
+
+def _location_result_matches(item, city, country, state):
+    """Helper: Check that a Nominatim result's city/state/country agree with the requested location"""
+    address = item.get('address', {})
+    
+    # Normalize input and result once for comparison
+    city_lower = city.lower().strip()
+    country_lower = country.lower().strip()
+    state_lower = state.lower().strip() if state else None
+    result_city = _pick_address_field(address, _CITY_KEYS).lower().strip()
+    result_country = (address.get('country') or '').lower().strip()
+    result_state = _pick_address_field(address, _STATE_KEYS).lower().strip()
+    # Also check display_name for multilingual support
+    display_name = item.get('display_name', '').lower()
+    
+    city_match = (city_lower in result_city or
+                  result_city in city_lower or
+                  city_lower in display_name)
+    country_match = (country_lower in result_country or
+                     result_country in country_lower or
+                     country_lower in display_name)
+    # State is optional - only compared if provided
+    state_match = (not state_lower or
+                   state_lower in result_state or
+                   result_state in state_lower or
+                   state_lower in display_name)
+    
+    if city_match and country_match and state_match:
+        print(f"Location verification: Match found: '{item.get('display_name', '')[:100]}'")
+        return True
+    
+    print(f"Location verification: No matching result found")
+    print(f"  Top result: city='{result_city}', state='{result_state}', country='{result_country}'")
+    return False
+
 def verify_location_exists(city, country, state=None, lang='en'):
     """
     Verify that a location (city, state, country) actually exists using Nominatim API.
-    Works exactly like api_city_suggestions - uses same language logic and URL format.
-    Simplified: Search for city, then iterate through results and compare city, state, country.
+    Uses the same language logic as api_city_suggestions.
+    Searches with the city, state and country fields and checks only the top-ranked result.
     Returns True if location is found, False otherwise.
     """
     if not city or not country:
         return False
     
-    import urllib.request
-    import json
-    import urllib.parse
-    
-    # Search for just the city (simpler approach)
-    print(f"Location verification: Searching for city='{city}'")
-    print(f"  Verifying: City='{city}', State='{state}', Country='{country}', Lang='{lang}'")
-    
-    # Use same language logic as city-suggestions endpoint
-    if lang == 'ua':
-        accept_lang = 'uk'
-    elif lang == 'ru':
-        accept_lang = 'ru'
-    else:
-        accept_lang = 'en'
-    
-    # Use EXACT same format as city-suggestions endpoint
-    url = f"https://nominatim.openstreetmap.org/search?q={urllib.parse.quote(city)}&format=json&limit=30&addressdetails=1&extratags=1&dedupe=1&accept-language={accept_lang}"
+    print(f"Location verification: City='{city}', State='{state}', Country='{country}', Lang='{lang}'")
     
+    # Including state and country in the search lets Nominatim rank the intended place first,
+    # so a single result is enough instead of scanning a long list of same-named cities
     try:
-        req = urllib.request.Request(url, headers={
-            'User-Agent': 'CineStream/1.0'
-        })
+        data = _nominatim_location_search(city, state, country, _nominatim_accept_lang(lang), timeout=10)
         
-        with urllib.request.urlopen(req, timeout=10) as response:
-            data = json.loads(response.read().decode())
-            
-            if not data or len(data) == 0:
-                print(f"Location verification: No results for city='{city}'")
-                return False
-            
-            print(f"Location verification: Found {len(data)} results for city='{city}'")
-            
-            # Normalize input for comparison
-            city_lower = city.lower().strip()
-            country_lower = country.lower().strip()
-            state_lower = state.lower().strip() if state else None
-            
-            # Iterate through results and compare city, state, country
-            for item in data:
-                address = item.get('address', {})
-                
-                # Extract result components
-                result_city = (address.get('city') or 
-                             address.get('town') or 
-                             address.get('village') or 
-                             address.get('municipality') or '').lower().strip()
-                result_country = (address.get('country') or '').lower().strip()
-                result_state = (address.get('state') or 
-                              address.get('province') or 
-                              address.get('region') or '').lower().strip()
-                
-                # Also check display_name for multilingual support
-                display_name = item.get('display_name', '').lower()
-                
-                # Compare city (check both result_city and display_name)
-                city_match = (city_lower in result_city or 
-                            result_city in city_lower or
-                            city_lower in display_name)
-                
-                # Compare country (check both result_country and display_name)
-                country_match = (country_lower in result_country or 
-                               result_country in country_lower or
-                               country_lower in display_name)
-                
-                # Compare state (optional - only if state provided)
-                state_match = True  # Default to True if no state provided
-                if state_lower:
-                    state_match = (state_lower in result_state or 
-                                 result_state in state_lower or
-                                 state_lower in display_name)
-                
-                # If all components match, location is verified
-                if city_match and country_match and state_match:
-                    print(f"Location verification: Match found!")
-                    print(f"  City: '{result_city}' matches '{city}'")
-                    print(f"  Country: '{result_country}' matches '{country}'")
-                    if state:
-                        print(f"  State: '{result_state}' matches '{state}'")
-                    print(f"  Display: '{item.get('display_name', '')[:100]}'")
-                    return True
-            
-            # No match found
-            print(f"Location verification: No matching result found")
-            print(f"  Searched for: City='{city}', State='{state}', Country='{country}'")
-            if len(data) > 0:
-                first_address = data[0].get('address', {})
-                print(f"  First result: city='{first_address.get('city', '')}', country='{first_address.get('country', '')}', state='{first_address.get('state', '')}'")
+        if not data:
+            print(f"Location verification: No results for city='{city}', state='{state}', country='{country}'")
             return False
-            
+        
+        return _location_result_matches(data[0], city, country, state)
+        
     except Exception as e:
         print(f"Location verification error: {e}")
-        import traceback
         traceback.print_exc()
         # On error, allow scraping (better to allow than block)
         print(f"Location verification: Exception occurred, allowing location")
         return True
 
+def _normalized_together_cache_key(city, state, country):
+    """Helper: Lookup-cache key shared by normalize_location_names_together and resolve_location"""
+    return f"normalized_together_{', '.join(part for part in (city, state, country) if part).lower()}"
+
+def _normalized_location_names(address, city, state, country):
+    """Helper: (city, state, country) names from one English Nominatim address, defaulting to the input"""
+    return (
+        _pick_address_field(address, _CITY_KEYS, city),
+        _pick_address_field(address, _STATE_KEYS, state) if state else None,
+        address.get('country', country)
+    )
+
 def normalize_location_names_together(city, state, country):
     """
     Optimized: Normalize city, state, and country in a single Nominatim API call.
@@ -419,55 +864,24 @@ def normalize_location_names_together(city, state, country):
     if not city or not country:
         return None
     
-    import urllib.request
-    import json
-    import urllib.parse
-    
     # Build search query with all components
-    location_parts = [city]
-    if state:
-        location_parts.append(state)
-    location_parts.append(country)
-    search_query = ', '.join(location_parts)
+    search_query = ', '.join(part for part in (city, state, country) if part)
     
     # Check cache first
-    cache_key = f"normalized_together_{search_query.lower()}"
-    cached = session.get(cache_key)
+    cache_key = _normalized_together_cache_key(city, state, country)
+    cached = _lookup_cache_get(cache_key)
     if cached:
-        return tuple(cached) if isinstance(cached, list) else None
+        return tuple(cached) if isinstance(cached, (list, tuple)) else None
     
     try:
-        url = f"https://nominatim.openstreetmap.org/search?q={urllib.parse.quote(search_query)}&format=json&limit=1&addressdetails=1&accept-language=en"
+        results = _nominatim_location_search(city, state, country, 'en', timeout=3)
         
-        req = urllib.request.Request(url, headers={
-            'User-Agent': 'CineStream/1.0'
-        })
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            results = json.loads(response.read().decode())
-            
-            if results and len(results) > 0:
-                result = results[0]
-                address = result.get('address', {})
-                
-                # Extract all three components from the same result
-                normalized_city = (address.get('city') or 
-                                 address.get('town') or 
-                                 address.get('village') or 
-                                 address.get('municipality') or
-                                 city)
-                normalized_country = address.get('country', country)
-                normalized_state = None
-                if state:
-                    normalized_state = (address.get('state') or 
-                                       address.get('province') or 
-                                       address.get('region') or
-                                       state)
-                
-                normalized = (normalized_city, normalized_state, normalized_country)
-                # Cache the result
-                session[cache_key] = list(normalized)  # Store as list for JSON serialization
-                return normalized
+        if results and len(results) > 0:
+            # Extract all three components from the same result
+            normalized = _normalized_location_names(results[0].get('address', {}), city, state, country)
+            # Cache the result
+            _lookup_cache_set(cache_key, normalized)
+            return normalized
         
         # If no results, return None to trigger fallback
         return None
@@ -476,6 +890,60 @@ def normalize_location_names_together(city, state, country):
         print(f"Combined normalization error for {search_query}: {e}")
         return None
 
+def resolve_location(city, state, country, lang='en'):
+    """
+    Verify a location and normalize its names to English, with a single Nominatim request in the common case.
+    A structured search only returns places whose city/state/country fields match, so a hit both verifies the
+    location and yields the English names. When it finds nothing, only free-text queries follow (the structured
+    one would miss again): one in the user's language to verify, reused for the names when that is English,
+    plus one English lookup for the names otherwise.
+    Returns tuple (exists, (city, state, country)); state is None when not provided.
+    """
+    cache_key = _normalized_together_cache_key(city, state, country)
+    cached = _lookup_cache_get(cache_key)
+    if cached:
+        return True, tuple(cached)
+    
+    try:
+        data = _nominatim_location_search(city, state, country, 'en', timeout=10, free_text_fallback=False)
+    except (requests.RequestException, ValueError) as e:
+        print(f"Structured location lookup error: {e}")
+        data = None
+    
+    if data:
+        normalized = _normalized_location_names(data[0].get('address', {}), city, state, country)
+        print(f"Location resolved: '{data[0].get('display_name', '')[:100]}'")
+        _lookup_cache_set(cache_key, normalized)
+        return True, normalized
+    
+    fallback = (city, state or None, country)
+    accept_lang = _nominatim_accept_lang(lang)
+    print(f"Location verification: City='{city}', State='{state}', Country='{country}', Lang='{lang}'")
+    try:
+        data = _nominatim_location_search(city, state, country, accept_lang, timeout=10, structured=False)
+        if not data:
+            print(f"Location verification: No results for city='{city}', state='{state}', country='{country}'")
+            return False, None
+        if not _location_result_matches(data[0], city, country, state):
+            return False, None
+        if accept_lang != 'en':
+            data = _nominatim_location_search(city, state, country, 'en', timeout=3, structured=False)
+    except Exception as e:
+        print(f"Location verification error: {e}")
+        traceback.print_exc()
+        # On error, allow scraping (better to allow than block)
+        print(f"Location verification: Exception occurred, allowing location")
+        return True, fallback
+    
+    if not data:
+        return True, fallback
+    normalized = _normalized_location_names(data[0].get('address', {}), city, state, country)
+    _lookup_cache_set(cache_key, normalized)
+    return True, normalized
+
+# Map our language codes to Google Translate codes
+_TRANSLATE_LANG_CODES = MappingProxyType({'en': 'en', 'ua': 'uk', 'ru': 'ru'})
+
 def translate_location_names(city, country, state=None, target_lang='en'):
     """
     Translate location names (city, state, country) to target language in a single API request.
@@ -502,24 +970,26 @@ def translate_location_names(city, country, state=None, target_lang='en'):
     if not parts:
         return city, country, state
     
+    if GoogleTranslator is None:
+        # deep-translator not installed, return original
+        print("deep-translator not available, skipping translation")
+        return city, country, state
+    
     try:
-        from deep_translator import GoogleTranslator
-        
-        # Map our language codes to Google Translate codes
-        lang_map = {
-            'en': 'en',
-            'ua': 'uk',
-            'ru': 'ru'
-        }
-        
-        target_code = lang_map.get(target_lang, 'en')
+        target_code = _TRANSLATE_LANG_CODES.get(target_lang, 'en')
         if target_code == 'en':
             return city, country, state
         
         # Join all parts with comma separator and translate in one request
+        # The same few places are translated over and over, so translations are kept in the lookup cache
         combined_text = ', '.join(parts)
-        translator = GoogleTranslator(source='en', target=target_code)
-        translated_combined = translator.translate(combined_text)
+        cache_key = f"translated|{target_code}|{combined_text}"
+        translated_combined = _lookup_cache_get(cache_key)
+        if translated_combined is None:
+            translator = GoogleTranslator(source='en', target=target_code)
+            translated_combined = translator.translate(combined_text)
+            if translated_combined and translated_combined.strip():
+                _lookup_cache_set(cache_key, translated_combined)
         
         if translated_combined and translated_combined.strip():
             # Split the translated result back into parts
@@ -545,10 +1015,6 @@ def translate_location_names(city, country, state=None, target_lang='en'):
         
         # If translation failed, return original
         return city, country, state
-    except ImportError:
-        # deep-translator not installed, return original
-        print("deep-translator not available, skipping translation")
-        return city, country, state
     except Exception as e:
         # Translation failed, return original
         print(f"Translation error for '{combined_text}' to {target_lang}: {e}")
@@ -562,58 +1028,44 @@ def normalize_location_name(name, location_type='city'):
     if not name or not name.strip():
         return name
     
-    import urllib.request
-    import json
-    import time
-    
     name = name.strip()
     
     # Cache normalized names to avoid repeated API calls
     cache_key = f"normalized_{location_type}_{name.lower()}"
-    cached = session.get(cache_key)
+    cached = _lookup_cache_get(cache_key)
     if cached:
         return cached
     
     try:
         # Use Nominatim to search for the location and get English name
-        # Add country context for better results
-        search_query = name
-        url = f"https://nominatim.openstreetmap.org/search?q={urllib.parse.quote(search_query)}&format=json&limit=1&addressdetails=1&accept-language=en"
-        
-        req = urllib.request.Request(url, headers={
-            'User-Agent': 'CineStream/1.0'
-        })
-        
-        with urllib.request.urlopen(req, timeout=3) as response:
-            results = json.loads(response.read().decode())
+        # city/state/country are structured search fields, so the name is matched against the right kind of place
+        base_url = "https://nominatim.openstreetmap.org/search?format=json&limit=1&addressdetails=1&accept-language=en"
+        results = None
+        if location_type in ('city', 'state', 'country'):
+            results = _http_get_json(f"{base_url}&{location_type}={quote(name)}", timeout=3)
+        if not results:
+            results = _http_get_json(f"{base_url}&q={quote(name)}", timeout=3)
+        
+        if results and len(results) > 0:
+            result = results[0]
+            address = result.get('address', {})
             
-            if results and len(results) > 0:
-                result = results[0]
-                address = result.get('address', {})
-                
-                # Get English name from display_name or address
-                if location_type == 'city':
-                    normalized = (address.get('city') or 
-                                 address.get('town') or 
-                                 address.get('village') or 
-                                 address.get('municipality') or
-                                 name)
-                elif location_type == 'country':
-                    normalized = address.get('country', name)
-                elif location_type == 'state':
-                    normalized = (address.get('state') or 
-                                 address.get('province') or 
-                                 address.get('region') or
-                                 name)
-                else:
-                    normalized = name
-                
-                # Cache the result
-                session[cache_key] = normalized
-                return normalized
+            # Get English name from display_name or address
+            if location_type == 'city':
+                normalized = _pick_address_field(address, _CITY_KEYS, name)
+            elif location_type == 'country':
+                normalized = address.get('country', name)
+            elif location_type == 'state':
+                normalized = _pick_address_field(address, _STATE_KEYS, name)
+            else:
+                normalized = name
+            
+            # Cache the result
+            _lookup_cache_set(cache_key, normalized)
+            return normalized
         
         # If no results, return original name
-        session[cache_key] = name
+        _lookup_cache_set(cache_key, name)
         return name
         
     except Exception as e:
@@ -621,6 +1073,25 @@ def normalize_location_name(name, location_type='city'):
         # Return original name if normalization fails
         return name
 
+def normalize_location_names_batch(city, state, country):
+    """
+    Normalize city, state and country to English with as few Nominatim requests as possible.
+    Tries one combined lookup first; only names it can't resolve fall back to per-name lookups.
+    Returns tuple (city, state, country).
+    """
+    normalized = normalize_location_names_together(city, state, country)
+    if normalized:
+        return normalized[0], normalized[1] or state, normalized[2]
+    
+    # Combined lookup unavailable (missing city/country or no result) - normalize each name on its own
+    # One at a time on purpose: public Nominatim allows ~1 request/second per client, and a parallel
+    # burst on this rare path would risk 429 throttling (or a ban) for little latency gain
+    city = normalize_location_name(city, 'city')
+    if state:
+        state = normalize_location_name(state, 'state')
+    country = normalize_location_name(country, 'country')
+    return city, state, country
+
 @app.route('/api/geocode', methods=['POST'])
 def api_geocode():
     """
@@ -647,63 +1118,52 @@ def api_geocode():
             return jsonify({'success': False, 'error': 'Invalid coordinate format'}), 400
         
         # Use Nominatim for reverse geocoding (free, no API key needed)
-        import urllib.request
-        import json
-        import urllib.parse
         
+        # Coordinates rounded to 4 decimals (~11 m) share one cached reverse lookup
+        lat = round(lat, 4)
+        lon = round(lon, 4)
         url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lon}&addressdetails=1&accept-language=en"
         
         try:
-            req = urllib.request.Request(url, headers={
-                'User-Agent': 'CineStream/1.0'  # Required by Nominatim
-            })
-            with urllib.request.urlopen(req, timeout=5) as response:
-                data = json.loads(response.read().decode())
+            cache_key = f"reverse|{lat}|{lon}"
+            data = _lookup_cache_get(cache_key, ttl=CITY_SUGGESTIONS_CACHE_TTL)
+            if data is None:
+                data = _http_get_json(url, timeout=5)
+                _lookup_cache_set(cache_key, data, ttl=CITY_SUGGESTIONS_CACHE_TTL)
+            
+            if data and 'address' in data:
+                address = data.get('address', {})
                 
-                if data and 'address' in data:
-                    address = data.get('address', {})
-                    
-                    # Extract city (can be in different fields) - already in English from accept-language=en
-                    city = (address.get('city') or 
-                           address.get('town') or 
-                           address.get('village') or 
-                           address.get('municipality') or
-                           address.get('county') or
-                           '')
-                    
-                    # Extract country - already in English
-                    country = address.get('country', '')
+                # Extract city (can be in different fields) - already in English from accept-language=en
+                city = _pick_address_field(address, _REVERSE_CITY_KEYS)
+                
+                # Extract country - already in English
+                country = address.get('country', '')
+                
+                # Extract region/state - already in English
+                region = _pick_address_field(address, _REVERSE_STATE_KEYS)
+                
+                if city and country:
+                    # The reverse lookup already returns canonical English names (accept-language=en),
+                    # so no extra Nominatim normalization round trip is needed
+                    city, region, country = city.strip(), region.strip(), country.strip()
                     
-                    # Extract region/state - already in English
-                    region = (address.get('state') or 
-                             address.get('province') or 
-                             address.get('region') or
-                             address.get('state_district') or
-                             '')
+                    # Translate to user's selected language (single API call for all)
+                    lang = get_language()
+                    city, country, region = translate_location_names(city, country, region, lang)
                     
-                    if city and country:
-                        # Normalize to ensure English names
-                        city = normalize_location_name(city.strip(), 'city')
-                        country = normalize_location_name(country.strip(), 'country')
-                        if region:
-                            region = normalize_location_name(region.strip(), 'state')
-                        
-                        # Translate to user's selected language (single API call for all)
-                        lang = get_language()
-                        city, country, region = translate_location_names(city, country, region, lang)
-                        
-                        return jsonify({
-                            'success': True,
-                            'city': city,
-                            'country': country,
-                            'region': region if region else None
-                        })
-                    else:
-                        return jsonify({'success': False, 'error': 'Could not determine city and country from coordinates'}), 400
+                    return jsonify({
+                        'success': True,
+                        'city': city,
+                        'country': country,
+                        'region': region if region else None
+                    })
                 else:
-                    return jsonify({'success': False, 'error': 'No address data found'}), 400
-                    
-        except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError, json.JSONDecodeError) as e:
+                    return jsonify({'success': False, 'error': 'Could not determine city and country from coordinates'}), 400
+            else:
+                return jsonify({'success': False, 'error': 'No address data found'}), 400
+                
+        except (requests.RequestException, ValueError) as e:
             print(f"Reverse geocoding error: {e}")
             return jsonify({'success': False, 'error': 'Geocoding service unavailable'}), 500
             
@@ -711,20 +1171,40 @@ def api_geocode():
         print(f"Error in geocode endpoint: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _fetch_city_suggestions(query, accept_lang, cache_key):
+    """Query Nominatim for city suggestions, extract city/state/country and cache the result list"""
+    url = f"https://nominatim.openstreetmap.org/search?q={quote(query)}&format=json&limit=30&addressdetails=1&extratags=1&dedupe=1&accept-language={accept_lang}"
+    data = _http_get_json(url, timeout=10)
+    
+    # Extract city, state, and country from each result
+    # Return structured data that frontend expects
+    results = []
+    for item in data[:10]:  # Limit to top 10
+        address = item.get('address', {})
+        
+        # Build result object with all original Nominatim data plus extracted fields
+        results.append({
+            **item,  # Include all original Nominatim fields
+            'city': _pick_address_field(address, _CITY_KEYS),
+            'state': _pick_address_field(address, _STATE_KEYS),
+            'country': address.get('country', '')
+        })
+    
+    print(f"City suggestions: Fetched {len(results)} results from Nominatim for query '{query}'")
+    _lookup_cache_set(cache_key, results, ttl=CITY_SUGGESTIONS_CACHE_TTL)
+    return results
+
 @app.route('/api/city-suggestions', methods=['GET'])
 def api_city_suggestions():
     """Proxy Nominatim city search requests to avoid CORS issues on old browsers"""
     try:
-        query = request.args.get('q', '').strip()
+        # Collapse runs of whitespace so "los  ang" and "los ang" share one lookup and cache entry
+        query = ' '.join(request.args.get('q', '').split())
         lang = request.args.get('lang', 'en')
         
         if not query or len(query) < 2:
             return jsonify([]), 200
         
-        import urllib.request
-        import json
-        import urllib.parse
-        
         # Use Nominatim for city search
         # Use accept-language to get results in the requested language (or English as default)
         # This ensures that when user types "odesa" in English, they get "Odesa" not "Одеса"
@@ -735,50 +1215,24 @@ def api_city_suggestions():
             accept_lang = 'ru'
         else:
             accept_lang = 'en'
-        url = f"https://nominatim.openstreetmap.org/search?q={urllib.parse.quote(query)}&format=json&limit=30&addressdetails=1&extratags=1&dedupe=1&accept-language={accept_lang}"
         
+        # Identical prefixes are requested on every keystroke; serve them without calling Nominatim
+        cache_key = f"suggest|{accept_lang}|{query.lower()}"
+        cached = _lookup_cache_get(cache_key, ttl=CITY_SUGGESTIONS_CACHE_TTL)
+        if cached is not None:
+            return jsonify(cached), 200
+        
+        # The fetch runs on the lookup pool and the request waits only up to the deadline;
+        # a slow Nominatim answer still lands in the cache for the user's next keystroke.
+        # Concurrent requests for the same prefix share one upstream call
+        future = _single_flight(cache_key, _fetch_city_suggestions, query, accept_lang, cache_key)
         try:
-            req = urllib.request.Request(url, headers={
-                'User-Agent': 'CineStream/1.0'  # Required by Nominatim
-            })
-            with urllib.request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode())
-                
-                # Extract city, state, and country from each result
-                # Return structured data that frontend expects
-                results = []
-                for item in data[:10]:  # Limit to top 10
-                    address = item.get('address', {})
-                    
-                    # Extract city name
-                    city = (address.get('city') or 
-                           address.get('town') or 
-                           address.get('village') or 
-                           address.get('municipality') or '')
-                    
-                    # Extract state/province
-                    state = (address.get('state') or 
-                            address.get('province') or 
-                            address.get('region') or '')
-                    
-                    # Extract country
-                    country = address.get('country', '')
-                    
-                    # Build result object with all original Nominatim data plus extracted fields
-                    result = {
-                        **item,  # Include all original Nominatim fields
-                        'city': city,
-                        'state': state,
-                        'country': country
-                    }
-                    results.append(result)
-                
-                print(f"City suggestions: Returning {len(results)} results from Nominatim for query '{query}'")
-                return jsonify(results), 200
-                
-        except (urllib.error.URLError, urllib.error.HTTPError, TimeoutError, json.JSONDecodeError) as e:
+            return jsonify(future.result(timeout=CITY_SUGGESTIONS_DEADLINE)), 200
+        except FuturesTimeoutError:
+            print(f"City suggestions: Nominatim slower than {CITY_SUGGESTIONS_DEADLINE}s for query '{query}', returning no results")
+            return jsonify([]), 200
+        except (requests.RequestException, ValueError) as e:
             print(f"City suggestions error: {e}")
-            import traceback
             traceback.print_exc()
             return jsonify([]), 200  # Return empty array on error
             
@@ -797,12 +1251,11 @@ def api_geocode_ip():
     try:
         geo_data = detect_city_from_ip()
         if geo_data:
-            # Normalize to English first
-            city = normalize_location_name(geo_data.get('city', ''), 'city')
-            country = normalize_location_name(geo_data.get('country', ''), 'country')
-            region = geo_data.get('region', '')
-            if region:
-                region = normalize_location_name(region, 'state')
+            city, region, country = geo_data.get('city', ''), geo_data.get('region', ''), geo_data.get('country', '')
+            # ip-api.com and GeoLite2 already report English names; only non-ASCII ones
+            # (e.g. "Zürich") go through the Nominatim normalization round trip
+            if not (city.isascii() and region.isascii() and country.isascii()):
+                city, region, country = normalize_location_names_batch(city, region, country)
             
             # Translate to user's selected language (single API call for all)
             lang = get_language()
@@ -828,41 +1281,72 @@ def api_showtimes():
         city_name = request.args.get('city_id') or request.args.get('city_name')
         format_filter = request.args.get('format')
         language_filter = request.args.get('language')
+        # Optional top-K: only the earliest N upcoming showtimes, capped to bound response size
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = min(max(limit, 1), SHOWTIMES_MAX_LIMIT)
         
         # Use the proper data structure (db.movies, not db.showtimes)
         if not city_name:
             return jsonify([])
         
-        # Get showtimes from movies collection (proper data structure)
-        showtimes = get_showtimes_for_city(city_name)
+        # Serve the already-encoded body for repeat polls (304 when the client's ETag matches)
+        cache_key = (city_name, format_filter, language_filter, limit)
+        cached = _showtimes_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            _, body, etag = cached
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            return response.make_conditional(request)
         
-        # Apply filters (format and language)
-        if format_filter:
-            showtimes = [s for s in showtimes if s.get('format') and s.get('format') == format_filter]
-        if language_filter:
-            showtimes = [s for s in showtimes if language_filter.lower() in s.get('language', '').lower()]
+        # Get showtimes from movies collection (proper data structure)
+        # Format and language filters run inside the MongoDB pipeline
+        showtimes = get_showtimes_for_city(city_name, format_filter, language_filter, limit)
         
         # Note: get_showtimes_for_city already filters past showtimes and sorts by start_time
         # No need to sort again - it's already sorted
         
-        return jsonify(showtimes)
+        # Encode once: the same bytes are the response body and the cached copy for later polls
+        body = app.json.dumps_bytes(showtimes)
+        response = Response(body, mimetype='application/json')
+        # An empty result may be a transient MongoDB error (the query helper returns []) - don't pin it for the TTL
+        if showtimes:
+            response.set_etag(_cache_showtimes_body(cache_key, body))
+        return response.make_conditional(request)
     except Exception as e:
         print(f"Error in api_showtimes: {e}")
-        import traceback
         traceback.print_exc()
         return jsonify({'error': 'Internal server error'}), 500
 
+def _conditional_status_response(payload):
+    """Helper: JSON status response with an ETag, answered with 304 when a poll's If-None-Match still matches"""
+    response = jsonify(payload)
+    response.set_etag(hashlib.blake2b(response.get_data(), digest_size=16).hexdigest())
+    # Clients may keep the body but must revalidate on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/scrape/status/<city_name>')
 def api_scrape_status(city_name):
     """Check scraping status for a city"""
     try:
         # URL decode city_name in case it contains special characters
-        from urllib.parse import unquote
         city_name = unquote(city_name)
         
-        city = db.locations.find_one({'city_name': city_name})
+        # Only the fields reported below are transferred
+        cached = _scrape_status_cache.get(city_name)
+        if cached and cached[0] > time.monotonic():
+            city = cached[1]
+        else:
+            city = db.locations.find_one(
+                {'city_name': city_name},
+                {'status': 1, 'last_updated': 1, 'lock_source': 1, 'error_message': 1}
+            )
+            if len(_scrape_status_cache) >= SCRAPE_STATUS_CACHE_MAX_ENTRIES:
+                _scrape_status_cache.clear()
+            _scrape_status_cache[city_name] = (time.monotonic() + SCRAPE_STATUS_CACHE_TTL, city)
         if not city:
-            return jsonify({'status': 'not_found', 'message': 'City not scraped yet'})
+            return _conditional_status_response({'status': 'not_found', 'message': 'City not scraped yet'})
         
         status = city.get('status', 'unknown')
         last_updated = city.get('last_updated')
@@ -880,16 +1364,15 @@ def api_scrape_status(city_name):
                     pass
         
         # Check if there's an active lock (scraping in progress)
-        from core.lock import get_lock_info
-        lock_info = get_lock_info(db, city_name)
-        is_processing = lock_info is not None or (status == 'processing')
+        # get_lock_info() would re-read this same document and only reports a lock when status is 'processing'
+        is_processing = status == 'processing'
         
         # Get error message if status is error
         error_message = None
         if status == 'error':
             error_message = city.get('error_message', 'An error occurred while fetching showtimes. Please check your API key configuration.')
         
-        return jsonify({
+        return _conditional_status_response({
             'status': status,
             'last_updated': last_updated_iso,
             'lock_source': lock_source,
@@ -922,6 +1405,26 @@ def _create_success_response(data, message='Success'):
     response.headers['Expires'] = '0'
     return response
 
+def _cache_showtimes_body(cache_key, body):
+    """Helper: Store an encoded /api/showtimes body with its ETag, and return the ETag"""
+    if len(_showtimes_cache) >= SHOWTIMES_CACHE_MAX_ENTRIES:
+        _showtimes_cache.clear()
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    _showtimes_cache[cache_key] = (time.monotonic() + SHOWTIMES_CACHE_TTL, body, etag)
+    return etag
+
+def _invalidate_showtimes_cache(city_id):
+    """Helper: Drop cached /api/showtimes bodies and showtime rows for a city after its data changes"""
+    for cache_key in [key for key in _showtimes_cache if key[0] == city_id]:
+        _showtimes_cache.pop(cache_key, None)
+    for cache_key in [key for key in _showtimes_rows_cache if key[0] == city_id]:
+        _showtimes_rows_cache.pop(cache_key, None)
+
+def _release_scrape_lock(location_id):
+    """Helper: Release the city's scrape lock and drop its cached status so the next poll sees the outcome"""
+    release_lock(db, location_id)
+    _scrape_status_cache.pop(location_id, None)
+
 def _save_error_to_db(location_id, error_message, is_api_key_error=False):
     """Helper: Save error to location document"""
     db.locations.update_one(
@@ -930,7 +1433,7 @@ def _save_error_to_db(location_id, error_message, is_api_key_error=False):
             '$set': {
                 'status': 'error',
                 'error_message': error_message,
-                'last_updated': datetime.now(timezone.utc)
+                'last_updated': datetime.now(_UTC)
             }
         },
         upsert=True
@@ -956,14 +1459,14 @@ def api_scrape():
     if len(city) < 2 or len(country) < 2 or (state and len(state) < 2):
         return jsonify({'error': 'Input too short'}), 400
     
-    dangerous_chars = ['<', '>', '{', '}', '[', ']', '$', '\\', '/']
-    if any(char in city or char in country or (state and char in state) for char in dangerous_chars):
+    if _DANGEROUS_CHARS_RE.search(city) or _DANGEROUS_CHARS_RE.search(country) or (state and _DANGEROUS_CHARS_RE.search(state)):
         return jsonify({'error': 'Invalid characters in input'}), 400
     
-    # Verify location exists
+    # Verify location exists and normalize its names (one Nominatim lookup when the structured search matches)
     try:
         lang = get_language()
-        if not verify_location_exists(city, country, state, lang):
+        exists, normalized = resolve_location(city, state, country, lang)
+        if not exists:
             return jsonify({
                 'error': 'Location not found. Please verify the city, state, and country names are correct.',
                 'error_type': 'location_verification_failed'
@@ -975,18 +1478,10 @@ def api_scrape():
             'error_type': 'verification_error'
         }), 500
     
-    # Normalize location names
-    try:
-        if state:
-            normalized = normalize_location_names_together(city, state, country)
-            if normalized:
-                city, state, country = normalized
-        else:
-            normalized = normalize_location_names_together(city, None, country)
-            if normalized:
-                city, _, country = normalized
-    except Exception as e:
-        print(f"Warning: Location normalization failed: {e}")
+    if state:
+        city, state, country = normalized
+    else:
+        city, _, country = normalized
     
     # Build location identifier
     location_id = f"{city}, {state}, {country}" if state else f"{city}, {country}"
@@ -1000,32 +1495,20 @@ def api_scrape():
     
     # Check for early exit - only check data completeness (not status)
     # Status can be wrong, but actual data completeness is the truth
-    from datetime import timedelta, timezone
-    now_utc = datetime.now(timezone.utc)
+    now_utc = datetime.now(_UTC)
     today = now_utc.date()
     two_weeks_from_today = today + timedelta(days=14)
     
     # Check if we have complete data (all 14 days)
-    movies = list(db.movies.find({'city_id': location_id}))
-    if movies:
-        dates_with_data = set()
-        for movie in movies:
-            for theater in movie.get('theaters', []):
-                for st in theater.get('showtimes', []):
-                    start_time = st.get('start_time')
-                    if isinstance(start_time, datetime):
-                        start_time_utc = start_time.replace(tzinfo=timezone.utc) if start_time.tzinfo is None else start_time.astimezone(timezone.utc)
-                        dates_with_data.add(start_time_utc.date())
-        
-        all_dates_present = all((today + timedelta(days=i)) in dates_with_data for i in range(15))
-        if all_dates_present:
-            # Data is complete - return it (this is the only early exit we need)
-            showtimes = get_showtimes_for_city(location_id)
-            return _create_success_response({
-                'status': 'fresh',
-                'message': 'Data is up to date (2 weeks coverage)',
-                'showtimes': showtimes
-            })
+    # MongoDB counts the distinct UTC dates with showtimes in the window, so no movie documents are transferred
+    if count_showtime_dates(location_id, today, 15) >= 15:
+        # Data is complete - return it (this is the only early exit we need)
+        showtimes = get_showtimes_for_city(location_id)
+        return _create_success_response({
+            'status': 'fresh',
+            'message': 'Data is up to date (2 weeks coverage)',
+            'showtimes': showtimes
+        })
     
     # Try to acquire lock with priority (on-demand requests take precedence)
     # On-demand can override daily-refresh locks immediately
@@ -1047,20 +1530,20 @@ def api_scrape():
             message = 'Scraping status changed. Please try again.'
         return jsonify({'status': 'processing', 'message': message}), 202
     
+    # The lock marks the city as processing - don't let a cached status hide that from pollers
+    _scrape_status_cache.pop(location_id, None)
+    
     try:
-        from datetime import timedelta, timezone
-        
         # Get existing showtime dates per movie/theater to optimize scraping
         # This allows the agent to skip dates/theaters that already have complete data
         existing_data = get_existing_showtime_dates(location_id)
         
         # Determine date range: always scrape from today to 14 days ahead
         # The agent will use existing_data to intelligently skip what's not needed
-        now = datetime.now(timezone.utc)
-        today = now.date()
-        two_weeks_from_today = today + timedelta(days=14)
+        # now_utc, today and two_weeks_from_today were computed once at the top of the handler
+        now = now_utc
         date_start = now
-        date_end = datetime.combine(two_weeks_from_today, datetime.max.time()).replace(tzinfo=timezone.utc)
+        date_end = datetime.combine(two_weeks_from_today, datetime.max.time()).replace(tzinfo=_UTC)
         
         # Check if we can skip scraping entirely (only if data is complete AND recently verified)
         # This is a performance optimization - we still need to discover new movies periodically
@@ -1089,16 +1572,14 @@ def api_scrape():
             
             # Only skip if data is complete AND we've verified recently (within 24 hours)
             # This ensures we still discover new movies periodically
+            # city_name is unique, so this is a single-document lookup; MongoDB checks last_updated on that document
             if all_up_to_date:
-                location = db.locations.find_one({'city_name': location_id})
-                if location:
-                    last_updated = location.get('last_updated')
-                    if last_updated:
-                        if isinstance(last_updated, datetime):
-                            hours_since_update = (now - last_updated).total_seconds() / 3600
-                            # If updated within 24 hours and data is complete, we can skip
-                            if hours_since_update < 24:
-                                should_skip_scraping = True
+                recently_updated = db.locations.find_one(
+                    {'city_name': location_id, 'last_updated': {'$gte': now - FRESHNESS_WINDOW}},
+                    {'_id': 1}
+                )
+                if recently_updated:
+                    should_skip_scraping = True
         
         if should_skip_scraping:
             # Data is complete and recently verified - no scraping needed
@@ -1130,6 +1611,9 @@ def api_scrape():
             
             movies_found = result.get('movies') and len(result.get('movies', [])) > 0
             
+            # One timestamp for everything this scrape writes (status, movie updates, expiry cutoff)
+            completed_at = datetime.now(_UTC)
+            
             # Always update status to 'fresh' on successful scrape
             # The agent's per-movie/theater optimization ensures we only scrape what's needed
             # If scraping succeeded, it means we've verified/updated the data
@@ -1141,7 +1625,7 @@ def api_scrape():
                         'state': state or '',
                         'country': country,
                         'status': 'fresh',
-                        'last_updated': datetime.now(timezone.utc)
+                        'last_updated': completed_at
                     },
                     '$unset': {
                         'error_message': ''  # Clear any previous error messages on success
@@ -1161,6 +1645,21 @@ def api_scrape():
                 inserted_count = 0
                 
                 try:
+                    # Fetch every existing movie for this scrape in one query instead of one find_one per movie
+                    scraped_titles = [m['movie']['en'] for m in result['movies']
+                                      if isinstance(m.get('movie'), dict) and m['movie'].get('en')]
+                    # The driver streams the matches in batches, like the other city-wide movie reads
+                    existing_by_title = {
+                        doc['movie']['en']: doc
+                        for doc in db.movies.find({'city_id': location_id, 'movie.en': {'$in': scraped_titles}},
+                                                  batch_size=200)
+                    }
+                    
+                    stored_titles = set(existing_by_title)
+                    
+                    # Writes are collected per title and sent in one bulk_write instead of one round-trip per movie
+                    # Repeated titles in a scrape merge into the pending document, as they did with sequential writes
+                    movie_ops = {}
                     for movie in result['movies']:
                         # Ensure city_id is set
                         movie['city_id'] = location_id
@@ -1181,7 +1680,7 @@ def api_scrape():
                         
                         # Update existing movie or insert new
                         # For existing movies, merge theaters and showtimes
-                        existing_movie = db.movies.find_one(query)
+                        existing_movie = existing_by_title.get(movie_en)
                         
                         if existing_movie:
                             # Merge theaters - update existing or add new
@@ -1199,13 +1698,17 @@ def api_scrape():
                                     existing_showtimes = theater_map[theater_name].get('showtimes', [])
                                     new_showtimes = new_theater.get('showtimes', [])
                                     
-                                    # Create set of existing showtime times to avoid duplicates
-                                    existing_times = {st.get('start_time') for st in existing_showtimes if st.get('start_time')}
+                                    # Built once per theater: integer UTC timestamps hash cheaply and make stored
+                                    # (naive) and freshly scraped (aware) datetimes for the same moment compare equal
+                                    existing_keys = {_showtime_merge_key(st.get('start_time'))
+                                                     for st in existing_showtimes if st.get('start_time')}
                                     
                                     # Add new showtimes that don't exist
                                     for new_st in new_showtimes:
-                                        if new_st.get('start_time') not in existing_times:
+                                        new_key = _showtime_merge_key(new_st.get('start_time'))
+                                        if new_key not in existing_keys:
                                             existing_showtimes.append(new_st)
+                                            existing_keys.add(new_key)
                                     
                                     theater_map[theater_name]['showtimes'] = existing_showtimes
                                     # Update address/website if provided
@@ -1219,68 +1722,59 @@ def api_scrape():
                             
                             # Update movie with merged theaters
                             movie['theaters'] = list(theater_map.values())
-                            movie['updated_at'] = datetime.now(timezone.utc)
+                            movie['updated_at'] = completed_at
                             
                             # Preserve existing created_at
                             if 'created_at' not in movie:
-                                from datetime import timezone
-                                movie['created_at'] = existing_movie.get('created_at', datetime.now(timezone.utc))
+                                movie['created_at'] = existing_movie.get('created_at', completed_at)
                             
-                            result_upsert = db.movies.replace_one(query, movie)
-                            if result_upsert.modified_count > 0:
-                                upserted_count += 1
+                        existing_by_title[movie_en] = movie
+                        if movie_en in stored_titles:
+                            movie_ops[movie_en] = ReplaceOne(query, movie)
                         else:
-                            # New movie - insert it
-                            result_insert = db.movies.insert_one(movie)
-                            if result_insert.inserted_id:
-                                inserted_count += 1
+                            # New movie - upsert it; if another scrape inserted the same title meanwhile,
+                            # $setOnInsert leaves that document alone instead of failing on city_movie_idx
+                            movie_ops[movie_en] = UpdateOne(query, {'$setOnInsert': movie}, upsert=True)
+                    
+                    if movie_ops:
+                        # ordered=False lets the server apply the batch without stopping at the first error
+                        # Two upserts racing on the same new title can still hit city_movie_idx; the loser is skipped
+                        try:
+                            write_result = db.movies.bulk_write(list(movie_ops.values()), ordered=False).bulk_api_result
+                        except BulkWriteError as bwe:
+                            write_result = bwe.details
+                            other_errors = [err for err in write_result['writeErrors'] if err.get('code') != 11000]
+                            if other_errors or write_result.get('writeConcernErrors'):
+                                raise
+                            print(f"Skipped {len(write_result['writeErrors'])} movies inserted concurrently")
+                        upserted_count = write_result['nModified']
+                        inserted_count = write_result['nUpserted']
                     
                     if upserted_count > 0 or inserted_count > 0:
                         print(f"Updated {upserted_count} existing movies, inserted {inserted_count} new movies")
                     
-                    # Clean up expired showtimes (older than 24 hours past their start_time)
-                    from datetime import timedelta, timezone
-                    expired_cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
-                    
-                    # Update all movies to remove expired showtimes
-                    movies_to_update = list(db.movies.find({'city_id': location_id}))
-                    for movie in movies_to_update:
-                        theaters = movie.get('theaters', [])
-                        updated = False
-                        for theater in theaters:
-                            showtimes = theater.get('showtimes', [])
-                            original_count = len(showtimes)
-                            # Filter expired showtimes (convert to UTC for comparison)
-                            filtered_showtimes = []
-                            for st in showtimes:
-                                start_time = st.get('start_time')
-                                if isinstance(start_time, datetime):
-                                    # Convert to UTC for comparison, but preserve original timezone
-                                    if start_time.tzinfo is None:
-                                        start_time_utc = start_time.replace(tzinfo=timezone.utc)
-                                    else:
-                                        start_time_utc = start_time.astimezone(timezone.utc)
-                                    if start_time_utc >= expired_cutoff:
-                                        filtered_showtimes.append(st)  # Keep original timezone
-                            showtimes = filtered_showtimes
-                            if len(showtimes) != original_count:
-                                theater['showtimes'] = showtimes
-                                updated = True
-                        
-                        if updated:
-                            # Remove theaters with no showtimes
-                            movie['theaters'] = [t for t in theaters if t.get('showtimes')]
-                            # Update movie if it still has theaters
-                            if movie['theaters']:
-                                db.movies.replace_one({'_id': movie['_id']}, movie)
-                            else:
-                                # Remove movie if no theaters left
-                                db.movies.delete_one({'_id': movie['_id']})
+                    # Clean up expired showtimes (older than 24 hours past their start_time) on the server:
+                    # pull expired (or non-date) showtimes, then theaters left without showtimes,
+                    # then movies left without theaters - three writes instead of one per changed movie
+                    expired_cutoff = completed_at - timedelta(hours=24)
+                    expired_showtime = {'$or': [
+                        {'start_time': {'$lt': expired_cutoff}},
+                        {'start_time': {'$not': {'$type': 'date'}}}
+                    ]}
+                    empty_theater = {'$or': [{'showtimes': {'$size': 0}}, {'showtimes': {'$exists': False}}]}
+                    db.movies.update_many(
+                        {'city_id': location_id, 'theaters.showtimes': {'$elemMatch': expired_showtime}},
+                        {'$pull': {'theaters.$[].showtimes': expired_showtime}}
+                    )
+                    db.movies.update_many(
+                        {'city_id': location_id, 'theaters': {'$elemMatch': empty_theater}},
+                        {'$pull': {'theaters': empty_theater}}
+                    )
+                    db.movies.delete_many({'city_id': location_id, 'theaters': {'$size': 0}})
                             
                 except Exception as insert_error:
                     # If insert fails, existing data is preserved
                     print(f"Error updating movies: {insert_error}")
-                    import traceback
                     traceback.print_exc()
                     db.locations.update_one(
                         {'city_name': location_id},
@@ -1288,12 +1782,10 @@ def api_scrape():
                     )
                     raise  # Re-raise to be caught by outer exception handler
                 
-                # Cleanup old images periodically (every 10th scrape)
-                import random
-                if random.randint(1, 10) == 1:
-                    cleanup_old_images()
+                # Movies changed - drop cached /api/showtimes bodies for this city
+                _invalidate_showtimes_cache(location_id)
             
-            release_lock(db, location_id)
+            _release_scrape_lock(location_id)
             
             # Return showtimes immediately so user doesn't need another request
             formatted_showtimes = get_showtimes_for_city(location_id)
@@ -1311,7 +1803,7 @@ def api_scrape():
             error_msg = result.get('error', 'Unknown error')
             is_api_key_error = 'api key' in error_msg.lower() or 'google' in error_msg.lower() or 'gemini' in error_msg.lower() or 'authentication' in error_msg.lower()
             _save_error_to_db(location_id, error_msg, is_api_key_error)
-            release_lock(db, location_id)
+            _release_scrape_lock(location_id)
             return _create_error_response(error_msg, 'api_key_error' if is_api_key_error else 'scraping_error')
             
     except ValueError as e:
@@ -1321,8 +1813,7 @@ def api_scrape():
             error_message = 'Google API key is not configured or invalid. Please check your GOOGLE_API_KEY or GEMINI_API_KEY environment variable.'
         if 'location_id' in locals():
             _save_error_to_db(location_id, error_message, is_api_key_error)
-            release_lock(db, location_id)
-        import traceback
+            _release_scrape_lock(location_id)
         print(f"Scraping error: {traceback.format_exc()}")
         return _create_error_response(error_message, 'api_key_error' if is_api_key_error else 'scraping_error', 500 if is_api_key_error else 400)
     except Exception as e:
@@ -1333,18 +1824,120 @@ def api_scrape():
             error_message = 'Google API key is not configured or invalid. Please check your GOOGLE_API_KEY or GEMINI_API_KEY environment variable.'
         if 'location_id' in locals():
             _save_error_to_db(location_id, error_message, is_api_key_error)
-            release_lock(db, location_id)
-        import traceback
+            _release_scrape_lock(location_id)
         print(f"Scraping error: {traceback.format_exc()}")
         return _create_error_response(error_message, 'api_key_error' if is_api_key_error else 'scraping_error')
 
+@dataclass
+class Showtime:
+    """
+    Flattened showtime row returned by get_showtimes_for_city.
+    Slotted to keep large per-city result lists compact; serialized as a JSON object.
+    Field order is movie fields, theater fields, then per-showtime fields.
+    """
+    __slots__ = (
+        'city', 'state', 'country', 'city_id',
+        'movie', 'movie_description', 'movie_image_url', 'movie_image_path', 'created_at',
+        'cinema_id', 'cinema_name', 'cinema_address', 'cinema_website',
+        'start_time', 'format', 'language', 'hall',
+    )
+    city: str
+    state: str
+    country: str
+    city_id: str
+    movie: Any
+    movie_description: Any
+    movie_image_url: Optional[str]
+    movie_image_path: Optional[str]
+    created_at: Any
+    cinema_id: str
+    cinema_name: str
+    cinema_address: str
+    cinema_website: str
+    start_time: datetime
+    format: Optional[str]
+    language: str
+    hall: str
+
+if parse_datetime is not None:
+    # ciso8601 parses 'Z' and offset suffixes natively in C - no fast path or string rebuild needed
+    _parse_iso = parse_datetime
+else:
+    def _parse_iso(value: str):
+        """Parse an ISO 8601 timestamp, with a fast path for 'YYYY-MM-DDTHH:MM:SSZ'"""
+        if len(value) == 20 and value[19] == 'Z':
+            return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19]), tzinfo=_UTC)
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _as_utc(value: datetime):
+    """Return value as an aware UTC datetime; naive values (PyMongo's default) are already UTC"""
+    tzinfo = value.tzinfo
+    if tzinfo is None:
+        return value.replace(tzinfo=_UTC)
+    return value if tzinfo is _UTC else value.astimezone(_UTC)
+
+def _showtime_merge_key(value):
+    """Hashable identity of a showtime start_time: UTC epoch seconds for datetimes, other values unchanged"""
+    if isinstance(value, datetime):
+        return int(_as_utc(value).timestamp())
+    return value
+
+def _utc_date(value: datetime):
+    """Return the UTC calendar date of value; naive values (PyMongo's default) are already UTC"""
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(_UTC).date()
+
+def _normalize_start_time(value, parse_cache):
+    """
+    Normalize a stored start_time (BSON datetime or legacy ISO string) to an aware datetime.
+    Naive values are taken as UTC; an explicit offset is kept so the UI can show it.
+    Strings are parsed once per distinct value via parse_cache. Returns None if unusable.
+    """
+    if isinstance(value, datetime):
+        return value if value.tzinfo is not None else value.replace(tzinfo=_UTC)
+    if not isinstance(value, str):
+        return None
+    parsed = parse_cache.get(value)
+    if parsed is None:
+        try:
+            parsed = _parse_iso(value)
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=_UTC)
+        parse_cache[value] = parsed
+    return parsed
+
+@lru_cache(maxsize=4096)
 def _normalize_theater_key(name: str, address: str):
-    """Normalize theater name and address for consistent matching"""
+    """Normalize theater name and address for consistent matching (memoized - theaters repeat across movies)"""
     # Normalize: lowercase, strip, remove extra spaces
     normalized_name = ' '.join(name.lower().strip().split())
     normalized_address = ' '.join(address.lower().strip().split())
     return (normalized_name, normalized_address)
 
+def count_showtime_dates(city_id, first_day, days):
+    """
+    Count the distinct UTC dates in [first_day, first_day + days) that have at least one showtime.
+    Computed by a MongoDB aggregation; legacy string start_times are not counted.
+    """
+    window_start = datetime.combine(first_day, datetime.min.time(), tzinfo=_UTC)
+    in_window = {'$gte': window_start, '$lt': window_start + timedelta(days=days)}
+    result = next(db.movies.aggregate([
+        {'$match': {'city_id': city_id, 'theaters.showtimes.start_time': in_window}},
+        {'$unwind': '$theaters'},
+        {'$unwind': '$theaters.showtimes'},
+        {'$match': {'theaters.showtimes.start_time': in_window}},
+        # $dateToString formats in UTC by default
+        {'$group': {'_id': None, 'days': {'$addToSet': {'$dateToString': {
+            'format': '%Y-%m-%d', 'date': '$theaters.showtimes.start_time'
+        }}}}},
+        {'$project': {'_id': 0, 'count': {'$size': '$days'}}}
+    ]), None)
+    return result['count'] if result else 0
+
 def get_existing_showtime_dates(city_id):
     """
     Get existing showtime dates per movie/theater combination.
@@ -1353,9 +1946,14 @@ def get_existing_showtime_dates(city_id):
     This allows the agent to skip scraping dates that already have data.
     Keys are normalized for consistent matching.
     """
-    from datetime import timedelta, timezone
     
-    movies = list(db.movies.find({'city_id': city_id}))
+    # Only titles, theater identity and start times are read - skip descriptions and image fields
+    # The cursor is iterated in batches instead of being materialized with list()
+    movies = db.movies.find(
+        {'city_id': city_id},
+        {'_id': 0, 'movie': 1, 'theaters.name': 1, 'theaters.address': 1, 'theaters.showtimes.start_time': 1},
+        batch_size=200
+    )
     existing_data = {}  # movie_title_key -> {(theater_name, theater_address): latest_date}
     
     for movie in movies:
@@ -1385,13 +1983,8 @@ def get_existing_showtime_dates(city_id):
             for st in showtimes:
                 start_time = st.get('start_time')
                 if isinstance(start_time, datetime):
-                    # Convert to UTC for comparison
-                    if start_time.tzinfo is None:
-                        start_time_utc = start_time.replace(tzinfo=timezone.utc)
-                    else:
-                        start_time_utc = start_time.astimezone(timezone.utc)
-                    # Get the date (ignore time)
-                    showtime_date = start_time_utc.date()
+                    # Get the UTC date (ignore time)
+                    showtime_date = _utc_date(start_time)
                     if latest_date is None or showtime_date > latest_date:
                         latest_date = showtime_date
             
@@ -1403,131 +1996,116 @@ def get_existing_showtime_dates(city_id):
     
     return existing_data
 
-def get_showtimes_for_city(city_name):
-    """Helper to get formatted showtimes for a city (flattened from movies structure)"""
+def get_showtimes_for_city(city_name, format_filter=None, language_filter=None, limit=None):
+    """
+    Helper to get formatted showtimes for a city (flattened from movies structure)
+    
+    format_filter matches the showtime format exactly; language_filter is a case-insensitive substring.
+    Both are applied inside the MongoDB pipeline. limit keeps only the earliest N upcoming showtimes.
+    Results are cached for SHOWTIMES_CACHE_TTL seconds; callers must not mutate the returned list.
+    """
+    cache_key = (city_name, format_filter, language_filter, limit)
+    cached = _showtimes_rows_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    showtimes = _query_showtimes_for_city(city_name, format_filter, language_filter, limit)
+    # Empty results aren't cached - they may come from a failed query
+    if showtimes:
+        if len(_showtimes_rows_cache) >= SHOWTIMES_CACHE_MAX_ENTRIES:
+            _showtimes_rows_cache.clear()
+        _showtimes_rows_cache[cache_key] = (time.monotonic() + SHOWTIMES_CACHE_TTL, showtimes)
+    return showtimes
+
+def _query_showtimes_for_city(city_name, format_filter, language_filter, limit):
+    """Helper: Run the showtimes aggregation for get_showtimes_for_city (uncached)"""
     try:
-        # Get all movies for this city
-        movies = list(db.movies.find({'city_id': city_name}))
+        # Hot names are bound to locals once - the inner loop runs once per showtime
+        now = datetime.now(_UTC)
+        normalize_start_time = _normalize_start_time
+        
+        # Drop past showtimes in MongoDB (start_time is a BSON date) so they are never transferred
+        # Legacy string start_times can't be compared server-side - pass them through and check below
+        # The first $match also skips movies with nothing upcoming before any per-theater work is done
+        upcoming_date = {'theaters.showtimes.start_time': {'$gte': now}}
+        legacy_string = {'theaters.showtimes.start_time': {'$type': 'string'}}
+        
+        def showtime_rows(upcoming, row_limit=None):
+            movie_match = {'city_id': city_name, **upcoming}
+            showtime_match = dict(upcoming)
+            if format_filter:
+                movie_match['theaters.showtimes.format'] = format_filter
+                showtime_match['theaters.showtimes.format'] = format_filter
+            if language_filter:
+                showtime_match['theaters.showtimes.language'] = {'$regex': re.escape(language_filter), '$options': 'i'}
+            
+            # MongoDB flattens movie -> theater -> showtime, filters each showtime and sorts the rows,
+            # so Python only wraps already-ordered flat documents. Only the row fields are transferred
+            pipeline = [
+                {'$match': movie_match},
+                {'$unwind': '$theaters'},
+                {'$unwind': '$theaters.showtimes'},
+                {'$match': showtime_match},
+                {'$sort': {'theaters.showtimes.start_time': 1}},
+            ]
+            if row_limit is not None:
+                pipeline.append({'$limit': row_limit})
+            pipeline.append({'$project': {
+                '_id': 0, 'city': 1, 'state': 1, 'country': 1, 'city_id': 1, 'movie': 1,
+                'movie_description': 1, 'movie_image_url': 1, 'movie_image_path': 1, 'created_at': 1,
+                'theaters.name': 1, 'theaters.address': 1, 'theaters.website': 1,
+                'theaters.showtimes.start_time': 1, 'theaters.showtimes.format': 1,
+                'theaters.showtimes.language': 1, 'theaters.showtimes.hall': 1,
+            }})
+            return db.movies.aggregate(pipeline, batchSize=200)
+        
+        if limit is None:
+            rows = showtime_rows({'$or': [upcoming_date, legacy_string]})
+        else:
+            # BSON orders strings before dates, so a single limited pipeline would spend the limit
+            # on legacy rows - $limit the date rows server-side and fetch the few legacy rows separately
+            rows = chain(showtime_rows(upcoming_date, limit), showtime_rows(legacy_string))
         
-        # Flatten movies structure to showtimes format for backward compatibility
-        from datetime import timezone
-        now = datetime.now(timezone.utc)
+        # Feeds repeat identical timestamps across theaters/halls - parse each distinct string once
+        parse_cache = {}
         
+        # Wrap the flat documents as Showtime rows for backward compatibility
         showtimes = []
-        for movie in movies:
-            movie_title = movie.get('movie', {})
-            movie_description = movie.get('movie_description', {})
-            movie_image_url = movie.get('movie_image_url')
-            movie_image_path = movie.get('movie_image_path')
+        append_showtime = showtimes.append
+        for row in rows:
+            row_get = row.get
+            theater = row['theaters']
+            st = theater['showtimes']
+            st_get = st.get
+            # BSON dates were already filtered by the pipeline; past legacy strings are dropped after sorting
+            start_time = normalize_start_time(st_get('start_time'), parse_cache)
+            if start_time is None:
+                continue
             
-            theaters = movie.get('theaters', [])
-            for theater in theaters:
-                theater_name = theater.get('name', 'Unknown')
-                theater_address = theater.get('address', '')
-                theater_website = theater.get('website', '')
-                
-                theater_showtimes = theater.get('showtimes', [])
-                for st in theater_showtimes:
-                    start_time = st.get('start_time')
-                    if isinstance(start_time, datetime):
-                        # Preserve original timezone - don't convert to UTC
-                        # Only convert to UTC for comparison purposes
-                        if start_time.tzinfo is None:
-                            # Naive datetime - assume UTC (shouldn't happen, but handle gracefully)
-                            start_time = start_time.replace(tzinfo=timezone.utc)
-                        
-                        # Convert to UTC only for comparison
-                        start_time_utc = start_time.astimezone(timezone.utc)
-                        
-                        # Only include future showtimes (compare in UTC)
-                        if start_time_utc >= now:
-                            # Store original timezone-aware datetime (preserves local timezone)
-                            showtimes.append({
-                                'city': movie.get('city', ''),
-                                'state': movie.get('state', ''),
-                                'country': movie.get('country', ''),
-                                'city_id': movie.get('city_id', ''),
-                                'cinema_id': theater_name,
-                                'cinema_name': theater_name,
-                                'cinema_address': theater_address,
-                                'cinema_website': theater_website,
-                                'movie': movie_title,
-                                'movie_description': movie_description,
-                                'movie_image_url': movie_image_url,
-                                'movie_image_path': movie_image_path,
-                                'start_time': start_time,  # Original timezone preserved
-                                'format': st.get('format'),
-                                'language': st.get('language', ''),
-                                'hall': st.get('hall', ''),
-                                'created_at': movie.get('created_at')
-                            })
-                    else:
-                        # Try to parse string datetime
-                        try:
-                            if isinstance(start_time, str):
-                                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                            
-                            # Preserve timezone if present
-                            if start_time.tzinfo is None:
-                                start_time = start_time.replace(tzinfo=timezone.utc)
-                            
-                            # Convert to UTC for comparison
-                            start_time_utc = start_time.astimezone(timezone.utc)
-                            
-                            # Only include future showtimes (compare in UTC)
-                            if start_time_utc >= now:
-                                # Store original timezone-aware datetime
-                                showtimes.append({
-                                    'city': movie.get('city', ''),
-                                    'state': movie.get('state', ''),
-                                    'country': movie.get('country', ''),
-                                    'city_id': movie.get('city_id', ''),
-                                    'cinema_id': theater_name,
-                                    'cinema_name': theater_name,
-                                    'cinema_address': theater_address,
-                                    'cinema_website': theater_website,
-                                    'movie': movie_title,
-                                    'movie_description': movie_description,
-                                    'movie_image_url': movie_image_url,
-                                    'movie_image_path': movie_image_path,
-                                    'start_time': start_time,  # Original timezone preserved
-                                    'format': st.get('format'),
-                                    'language': st.get('language', ''),
-                                    'hall': st.get('hall', ''),
-                                    'created_at': movie.get('created_at')
-                                })
-                        except (ValueError, AttributeError):
-                            continue
-        
-        # Sort showtimes by start_time (ascending - earliest first)
-        def get_sort_time(st):
-            """Helper to extract sortable time from showtime"""
-            start_time = st.get('start_time')
-            if isinstance(start_time, datetime):
-                return start_time
-            elif isinstance(start_time, str):
-                try:
-                    return datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    return datetime.max
-            else:
-                return datetime.max
-        
-        showtimes.sort(key=get_sort_time)
-        
-        # Convert datetime objects to ISO strings for JSON
-        for st in showtimes:
-            if isinstance(st.get('start_time'), datetime):
-                st['start_time'] = st['start_time'].isoformat()
-            if isinstance(st.get('created_at'), datetime):
-                st['created_at'] = st['created_at'].isoformat()
-            if '_id' in st:
-                st['_id'] = str(st['_id'])
+            theater_name = theater.get('name', 'Unknown')
+            append_showtime(Showtime(
+                row_get('city', ''), row_get('state', ''), row_get('country', ''), row_get('city_id', ''),
+                row_get('movie', {}), row_get('movie_description', {}),
+                row_get('movie_image_url'), row_get('movie_image_path'), row_get('created_at'),
+                theater_name, theater_name, theater.get('address', ''), theater.get('website', ''),
+                start_time, st_get('format'), st_get('language', ''), st_get('hall', '')
+            ))
+        
+        # Rows arrive sorted by start_time - only legacy string start_times (which BSON orders
+        # before dates) need a re-sort in Python, after which the past ones form a prefix that
+        # is cut with one binary search instead of comparing every row against now
+        if parse_cache:
+            start_key = attrgetter('start_time')
+            showtimes.sort(key=start_key)
+            del showtimes[:bisect_left(list(map(start_key, showtimes)), now)]
+        if limit is not None:
+            del showtimes[limit:]
+        
+        # Datetimes are left as-is: CineStreamJSONProvider serializes them as ISO 8601 strings
         
         return showtimes
     except Exception as e:
         print(f"Error getting showtimes for city: {e}")
-        import traceback
         traceback.print_exc()
         return []
 
@@ -1535,39 +2113,52 @@ def get_showtimes_for_city(city_name):
 def set_lang(lang):
     """Set language endpoint"""
     # Validate language to prevent injection
-    if lang in ['en', 'ua', 'ru']:
+    if lang in _VALID_LANGS:
         set_language(lang)
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/static/movie_images/<filename>')
 def serve_movie_image(filename):
     """Serve movie images from local storage"""
-    from flask import send_from_directory
-    from core.image_handler import IMAGE_BASE_DIR, ensure_image_directory
-    import os.path
-    
     try:
         # Security: prevent directory traversal and validate filename
         if not filename or not isinstance(filename, str):
             return '', 404
         
-        # Remove any path components
-        filename = os.path.basename(filename)
-        
-        # Validate filename doesn't contain dangerous characters
-        if '..' in filename or '/' in filename or '\\' in filename:
+        # Validate filename in one pass: word characters, dots and dashes only (no path
+        # separators), no '..', and an image extension
+        if not _SAFE_IMAGE_FILENAME_RE.fullmatch(filename):
             return '', 404
         
-        # Validate filename format (alphanumeric, dots, dashes, underscores only)
-        if not all(c.isalnum() or c in ('.', '-', '_') for c in filename):
-            return '', 404
+        image_dir_fd = _get_image_dir_fd()
         
-        # Validate extension
-        if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-            return '', 404
+        # Behind Nginx, hand the file transfer off to an internal location via X-Accel-Redirect
+        if IMAGE_ACCEL_REDIRECT_PREFIX:
+            response = Response(mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['X-Accel-Redirect'] = IMAGE_ACCEL_REDIRECT_PREFIX + filename
+            response.headers['Cache-Control'] = f'public, max-age={IMAGE_CACHE_MAX_AGE}'
+            return response
         
-        ensure_image_directory()
-        return send_from_directory(IMAGE_BASE_DIR, filename)
+        if image_dir_fd is None:
+            return send_from_directory(IMAGE_BASE_DIR, filename, max_age=IMAGE_CACHE_MAX_AGE)
+        
+        # openat() relative to the cached directory fd - no path join/realpath per request
+        try:
+            fd = os.open(filename, os.O_RDONLY, dir_fd=image_dir_fd)
+        except FileNotFoundError:
+            return '', 404
+        image_file = os.fdopen(fd, 'rb')
+        stat = os.fstat(fd)
+        # Size comes from the fstat above, so Content-Length and Range (206) work without a path lookup
+        response = Response(wrap_file(request.environ, image_file),
+                            mimetype=mimetypes.guess_type(filename)[0],
+                            direct_passthrough=True)
+        response.content_length = stat.st_size
+        response.last_modified = stat.st_mtime
+        response.set_etag(f'{int(stat.st_mtime)}-{stat.st_size}')
+        response.cache_control.public = True
+        response.cache_control.max_age = IMAGE_CACHE_MAX_AGE
+        return response.make_conditional(request, accept_ranges=True, complete_length=stat.st_size)
     except Exception as e:
         print(f"Error serving image {filename}: {e}")
         return '', 404
@@ -1581,25 +2172,45 @@ def api_cleanup_images():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _claim_image_cleanup_lease():
+    """
+    Claim the shared image-cleanup lease for one interval.
+    Returns True for exactly one worker per interval, across processes and servers.
+    """
+    now = datetime.now(_UTC)
+    try:
+        db.stats.find_one_and_update(
+            {'_id': 'image_cleanup_lease', 'expires_at': {'$lt': now}},
+            {'$set': {'expires_at': now + timedelta(seconds=IMAGE_CLEANUP_INTERVAL)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Lease document exists and hasn't expired - the upsert collided with it, so another worker holds it
+        return False
+    return True
+
+def _image_cleanup_loop():
+    """Remove expired movie images on a fixed schedule, off the request path"""
+    while True:
+        try:
+            if _claim_image_cleanup_lease():
+                cleanup_old_images()
+        except Exception as e:
+            print(f"Error in scheduled image cleanup: {e}")
+        time.sleep(IMAGE_CLEANUP_INTERVAL)
+
+# Every worker starts the loop; the lease makes sure only one of them walks the image directory per interval
+threading.Thread(target=_image_cleanup_loop, name='image-cleanup', daemon=True).start()
+
 @app.errorhandler(404)
 def page_not_found(e):
     """Handle 404 errors"""
-    lang = get_language()
-    if lang not in TRANSLATIONS:
-        lang = 'en'
-    t = TRANSLATIONS[lang]
-    
-    return render_template('404.html', translations=t, lang=lang), 404
+    return render_template('404.html', **_base_context()), 404
 
 @app.route('/terms')
 def terms():
     """Terms of Service page"""
-    lang = get_language()
-    if lang not in TRANSLATIONS:
-        lang = 'en'
-    t = TRANSLATIONS[lang]
-    
-    return render_template('terms.html', translations=t, lang=lang, datetime=datetime)
+    return render_template('terms.html', **_base_context(), datetime=datetime)
 
 @app.route('/api/feedback', methods=['POST'])
 def api_feedback():
@@ -1624,14 +2235,13 @@ def api_feedback():
         subject = f'CineStream Feedback from {safe_name}'
         
         # Create email body (sanitize inputs to prevent injection)
-        from datetime import timezone
         safe_email = (email or 'Not provided').replace('\n', ' ').replace('\r', '').strip()[:200]
         safe_message = message.replace('\r\n', '\n').replace('\r', '\n')[:5000]  # Normalize line endings
         email_body = f"""Feedback from CineStream Website
 
 Name: {safe_name}
 Email: {safe_email}
-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}
+Date: {datetime.now(_UTC).strftime('%Y-%m-%d %H:%M:%S UTC')}
 
 Message:
 {safe_message}
@@ -1708,7 +2318,6 @@ Message:
             print(f"{'='*60}\n")
             
             # Also log full traceback for debugging
-            import traceback
             print("Full traceback:")
             traceback.print_exc()
         
@@ -1716,18 +2325,12 @@ Message:
     
     except Exception as e:
         print(f"Error processing feedback: {e}")
-        import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': 'Internal server error'}), 500
 
 def main():
-    """Main entry point"""
-    parser = argparse.ArgumentParser(description='CineStream Web Application')
-    parser.add_argument('--port', type=int, default=8000, help='Port to bind to')
-    parser.add_argument('--host', default='127.0.0.1', help='Host to bind to')
-    parser.add_argument('--debug', action='store_true', help='Enable debug mode')
-    
-    args = parser.parse_args()
+    """Main entry point (development server; production runs were handed to gunicorn at import)"""
+    args = _parse_args()
     
     port = args.port
     host = args.host
@@ -1740,4 +2343,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
@@ -9,6 +9,7 @@ import sys
 from datetime import datetime, timezone
 from pymongo import MongoClient, ASCENDING
 from pymongo.errors import ConnectionFailure
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -23,7 +24,6 @@ try:
     client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
     client.server_info()  # Test connection
     # Extract database name from URI or use default
-    from urllib.parse import urlparse
     parsed = urlparse(MONGO_URI)
     db_name = parsed.path.lstrip('/').split('?')[0] if parsed.path else 'movie_db'
     db = client[db_name] if db_name else client.movie_db
@@ -43,9 +43,39 @@ def create_locations_collection():
     db.locations.create_index([("country", ASCENDING)], name="country_idx")
     db.locations.create_index([("state", ASCENDING)], name="state_idx")
     db.locations.create_index([("city", ASCENDING), ("state", ASCENDING), ("country", ASCENDING)], name="city_state_country_idx")
+    # city_name is unique, so the freshness check needs no compound index - drop the one older runs created
+    if "city_name_last_updated_idx" in db.locations.index_information():
+        db.locations.drop_index("city_name_last_updated_idx")
     
     print("  ✓ Created indexes: geo (2dsphere), status, city_name, country, state, city+state+country")
 
+def upgrade_city_movie_index(keys):
+    """
+    Replace the older non-unique city_movie_idx with the unique one.
+    MongoDB can't hold both (same keys, different options), so the old index is only dropped once no
+    duplicate movies remain, and is rebuilt if the unique build still fails - never leaving no index.
+    """
+    duplicates = list(db.movies.aggregate([
+        {'$group': {'_id': {'city_id': '$city_id', 'movie': '$movie.en'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
+        {'$limit': 5}
+    ]))
+    if duplicates:
+        print("  ! Kept the non-unique city_movie_idx: duplicate movies exist for (city_id, movie.en), e.g.:")
+        for duplicate in duplicates:
+            print(f"      {duplicate['_id']} x{duplicate['count']}")
+        print("    Remove the duplicates and re-run this script to enforce uniqueness")
+        return
+    
+    db.movies.drop_index("city_movie_idx")
+    try:
+        db.movies.create_index(keys, name="city_movie_idx", unique=True)
+    except Exception:
+        # A duplicate slipped in between the check and the build - restore the old index before failing
+        db.movies.create_index(keys, name="city_movie_idx")
+        raise
+    print("  ✓ Upgraded city_movie_idx to unique")
+
 def create_movies_collection():
     """Create movies collection with indexes and TTL"""
     print("Creating 'movies' collection...")
@@ -56,10 +86,18 @@ def create_movies_collection():
     # Index for finding movies by title
     db.movies.create_index([("movie.en", ASCENDING)], name="movie_en_idx")
     db.movies.create_index([("movie.local", ASCENDING)], name="movie_local_idx")
-    # Compound index for city + movie title (for upserts)
-    db.movies.create_index([("city_id", ASCENDING), ("movie.en", ASCENDING)], name="city_movie_idx")
-    # Index for finding showtimes by date range (using nested theaters.showtimes.start_time)
-    # Note: MongoDB doesn't support direct indexing of nested arrays, but we can query them
+    # Unique compound index for city + movie title (one document per movie per city)
+    city_movie_keys = [("city_id", ASCENDING), ("movie.en", ASCENDING)]
+    city_movie_idx = db.movies.index_information().get("city_movie_idx")
+    if city_movie_idx and not city_movie_idx.get("unique"):
+        upgrade_city_movie_index(city_movie_keys)
+    else:
+        db.movies.create_index(city_movie_keys, name="city_movie_idx", unique=True)
+    # Compound multikey index for the showtimes query (city + upcoming nested start_time)
+    db.movies.create_index(
+        [("city_id", ASCENDING), ("theaters.showtimes.start_time", ASCENDING)],
+        name="city_showtime_start_idx"
+    )
     
     # Create TTL index (expires after 90 days = 7,776,000 seconds = 3 months)
     # This ensures movies and associated movie images are automatically deleted after 3 months
@@ -69,7 +107,7 @@ def create_movies_collection():
         name="created_at_ttl"
     )
     
-    print("  ✓ Created indexes: city_id, movie.en, movie.local, city_id+movie.en, created_at (TTL: 90 days = 3 months)")
+    print("  ✓ Created indexes: city_id, movie.en, movie.local, city_id+movie.en (unique), city_id+theaters.showtimes.start_time, created_at (TTL: 90 days = 3 months)")
 
 def create_stats_collection():
     """Create stats collection and initialize visitor counter"""